@@ -15,26 +15,12 @@ def add_execution_location_column():
     try:
         conn = get_db_connection()
         with conn.cursor() as cur:
-            print("Checking for 'execution_location' column in 'metadata.tool' table...")
-            # Check if the column already exists
+            print("Adding 'execution_location' column to 'metadata.tool' table if it does not exist...")
             cur.execute("""
-                SELECT 1
-                FROM information_schema.columns
-                WHERE table_schema = 'metadata'
-                  AND table_name = 'tool'
-                  AND column_name = 'execution_location';
+                ALTER TABLE metadata.tool
+                ADD COLUMN IF NOT EXISTS "execution_location" TEXT;
             """)
-            exists = cur.fetchone()
-
-            if exists:
-                print("'execution_location' column already exists.")
-            else:
-                print("Column not found. Adding 'execution_location' column...")
-                cur.execute("""
-                    ALTER TABLE metadata.tool
-                    ADD COLUMN "execution_location" TEXT;
-                """)
-                print("'execution_location' column added successfully.")
+            print("'execution_location' column is present.")
             
             conn.commit()
             
@@ -4,7 +4,6 @@ import sys
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
-import uuid
 
 # Load environment variables
 load_dotenv('local.env')
@@ -17,14 +16,13 @@ def create_agent_in_db(agent_name):
     """Create a new agent in the database and return its ID."""
     with get_db_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # Create new agent
+            # Create new agent; the id is generated server-side
             cur.execute("""
                 INSERT INTO metadata.agent 
                 (id, name, description, "systemPrompt", "llmModelId", "isDefault")
-                VALUES (%s, %s, %s, %s, %s, %s)
+                VALUES (uuid_generate_v4(), %s, %s, %s, %s, %s)
                 RETURNING id
             """, (
-                str(uuid.uuid4()),
                 agent_name,
                 f"Agent {agent_name}",
                 f"You are {agent_name}, a helpful AI assistant.",
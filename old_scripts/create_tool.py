@@ -6,6 +6,11 @@ from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 import uuid
 
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library json module
+    orjson = None
+
 # Load environment variables
 load_dotenv('local.env')
 
@@ -13,60 +18,52 @@ def get_db_connection():
     """Create a database connection using environment variables."""
     return psycopg2.connect(os.getenv('PG_DATABASE_URL'))
 
-def create_tool_in_db(agent_id):
-    """Create a new tool in the database and return its ID."""
-    with get_db_connection() as conn:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # Create new tool
-            cur.execute("""
+def create_tool_in_db(conn, agent_id):
+    """Create a new tool in the database and return its ID along with the agent's name."""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        # Look up the agent name on the same cursor used for the inserts
+        cur.execute("""
+            SELECT name FROM metadata.agent WHERE id = %s
+        """, (agent_id,))
+        result = cur.fetchone()
+        if not result:
+            raise Exception(f"Agent with ID {agent_id} not found")
+        agent_name = result['name']
+
+        # Create the tool and its agent-tool relationship in one statement; ids are generated server-side
+        cur.execute("""
+            WITH new_tool AS (
                 INSERT INTO metadata.tool 
                 (id, "toolName", "descriptionForLlm", "jsonSchema", "toolType", "isSystemTool")
-                VALUES (%s, %s, %s, %s, %s, %s)
+                VALUES (uuid_generate_v4(), %s, %s, %s, %s, %s)
                 RETURNING id
-            """, (
-                str(uuid.uuid4()),
-                f"tool_{uuid.uuid4().hex[:8]}",  # Generate a unique tool name
-                "A tool for the agent to use",
-                json.dumps({}),  # Empty JSON schema for now
-                'custom',
-                True
-            ))
-            tool_id = cur.fetchone()['id']
-            
-            # Create agent-tool relationship
-            cur.execute("""
+            ), new_agent_tool AS (
                 INSERT INTO metadata.agent_tool 
                 (id, "agentId", "toolId")
-                VALUES (%s, %s, %s)
-                RETURNING id
-            """, (
-                str(uuid.uuid4()),
-                agent_id,
-                tool_id
-            ))
-            
-            conn.commit()
-            return tool_id
+                SELECT uuid_generate_v4(), %s, id FROM new_tool
+            )
+            SELECT id FROM new_tool
+        """, (
+            f"tool_{uuid.uuid4().hex[:8]}",  # Generate a unique tool name
+            "A tool for the agent to use",
+            json.dumps({}),  # Empty JSON schema for now
+            'custom',
+            True,
+            agent_id
+        ))
+        tool_id = cur.fetchone()['id']
+        
+        conn.commit()
+        return tool_id, agent_name
 
-def update_agent_schema(agent_id, tool_id):
+def update_agent_schema(agent_name, tool_id):
     """Update the agent's jsonSchema.json to include the new tool."""
-    # First, get the agent name from the database
-    with get_db_connection() as conn:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT name FROM metadata.agent WHERE id = %s
-            """, (agent_id,))
-            result = cur.fetchone()
-            if not result:
-                raise Exception(f"Agent with ID {agent_id} not found")
-            agent_name = result['name']
-    
     # Update the jsonSchema.json file
     schema_path = os.path.join('agents', agent_name, 'jsonSchema.json')
     
     # Read existing schema
-    with open(schema_path, 'r') as f:
-        schema = json.load(f)
+    with open(schema_path, 'rb') as f:
+        schema = orjson.loads(f.read()) if orjson else json.load(f)
     
     # Initialize tools array if it doesn't exist
     if 'tools' not in schema:
@@ -78,8 +75,11 @@ def update_agent_schema(agent_id, tool_id):
     })
     
     # Write updated schema
-    with open(schema_path, 'w') as f:
-        json.dump(schema, f, indent=2)
+    with open(schema_path, 'wb') as f:
+        if orjson:
+            f.write(orjson.dumps(schema, option=orjson.OPT_INDENT_2))
+        else:
+            f.write(json.dumps(schema, indent=2).encode('utf-8'))
 
 def main():
     """Main function to create a new tool."""
@@ -91,11 +91,12 @@ def main():
     
     try:
         # Create tool in database
-        tool_id = create_tool_in_db(agent_id)
+        with get_db_connection() as conn:
+            tool_id, agent_name = create_tool_in_db(conn, agent_id)
         print(f"Created tool with ID: {tool_id}")
         
         # Update agent's jsonSchema.json
-        update_agent_schema(agent_id, tool_id)
+        update_agent_schema(agent_name, tool_id)
         print(f"Updated agent's jsonSchema.json with new tool")
         
     except Exception as e:
@@ -1,9 +1,15 @@
 import os
+import io
+import csv
 import json
 import psycopg2
-from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library json module
+    orjson = None
+
 # Load environment variables
 load_dotenv('local.env')
 
@@ -20,8 +26,8 @@ def read_agent_files(agent_name):
         system_prompt = f.read().strip()
     
     # Read JSON schema
-    with open(os.path.join(agent_dir, 'jsonSchema.json'), 'r') as f:
-        schema = json.load(f)
+    with open(os.path.join(agent_dir, 'jsonSchema.json'), 'rb') as f:
+        schema = orjson.loads(f.read()) if orjson else json.load(f)
     
     # Extract system message from schema if it exists
     system_message = next(
@@ -38,83 +44,115 @@ def read_agent_files(agent_name):
         'schema': schema
     }
 
-def create_agent_with_id(conn, agent_data):
-    """Create an agent in the database using the ID from the schema."""
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        # Get agent ID from schema
-        agent_id = agent_data['schema'].get('agentId')
-        if not agent_id:
-            raise ValueError(f"No agentId found in schema for agent {agent_data['name']}")
-        
-        # Create agent with specified ID
-        cur.execute("""
-            INSERT INTO metadata.agent 
-            (id, name, description, "systemPrompt", "llmModelId", "isDefault")
-            VALUES (%s, %s, %s, %s, %s, %s)
-            RETURNING id
-        """, (
-            agent_id,
-            agent_data['name'],
-            agent_data['schema'].get('description', ''),
-            agent_data['systemPrompt'],
-            'gpt-4',  # Default model
-            False
+def create_agent_with_id(agent_data):
+    """Build the agent, tool and agent-tool rows for an agent using the ID from the schema."""
+    # Get agent ID from schema
+    agent_id = agent_data['schema'].get('agentId')
+    if not agent_id:
+        raise ValueError(f"No agentId found in schema for agent {agent_data['name']}")
+
+    agent_row = (
+        agent_id,
+        agent_data['name'],
+        agent_data['schema'].get('description', ''),
+        agent_data['systemPrompt'],
+        'gpt-4',  # Default model
+        False
+    )
+
+    tool_rows = []
+    agent_tool_rows = []
+
+    # Get tools from schema
+    for tool in agent_data['schema'].get('tools', []):
+        tool_id = tool.get('toolId')
+        if not tool_id:
+            continue
+
+        parameters = tool['function'].get('parameters', {})
+        tool_rows.append((
+            tool_id,
+            tool['function']['name'],
+            tool['function']['description'],
+            orjson.dumps(parameters).decode('utf-8') if orjson else json.dumps(parameters),
+            tool['type'],
+            True,
+            tool.get('internalApiPath')
         ))
-        
-        # Get tools from schema
-        schema_tools = agent_data['schema'].get('tools', [])
-        
-        # Create tools and their relationships
-        for tool in schema_tools:
-            tool_id = tool.get('toolId')
-            if not tool_id:
-                continue
-            
-            # Create tool
-            cur.execute("""
-                INSERT INTO metadata.tool 
-                (id, "toolName", "descriptionForLlm", "jsonSchema", "toolType", "isSystemTool", "internalApiPath")
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (id) DO NOTHING
-            """, (
-                tool_id,
-                tool['function']['name'],
-                tool['function']['description'],
-                json.dumps(tool['function'].get('parameters', {})),
-                tool['type'],
-                True,
-                tool.get('internalApiPath')
-            ))
-            
-            # Create agent-tool relationship
-            cur.execute("""
-                INSERT INTO metadata.agent_tool 
-                (id, "agentId", "toolId")
-                VALUES (uuid_generate_v4(), %s, %s)
-                ON CONFLICT ("agentId", "toolId") DO NOTHING
-            """, (agent_id, tool_id))
-        
-        return agent_id
+        agent_tool_rows.append((agent_id, tool_id))
+
+    return agent_row, tool_rows, agent_tool_rows
+
+def copy_rows(cur, table, columns, rows):
+    """Bulk load rows into a table with COPY FROM STDIN using an in-memory CSV buffer."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow(['\\N' if value is None else value for value in row])
+    buf.seek(0)
+    cur.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+        buf
+    )
 
 def main():
     """Main function to sync all local agents to a fresh database."""
     try:
         # Get all agent directories
-        agent_dirs = [d for d in os.listdir('agents') 
-                     if os.path.isdir(os.path.join('agents', d))]
+        with os.scandir('agents') as entries:
+            agent_dirs = [entry.name for entry in entries if entry.is_dir()]
         
         with get_db_connection() as conn:
             with conn.cursor() as cur:
                 print("Clearing existing data...")
-                cur.execute("DELETE FROM metadata.agent_tool;")
-                cur.execute("DELETE FROM metadata.agent;")
+                # Both tables in one TRUNCATE covers agent_tool's reference to agent; no CASCADE, so any
+                # other referencing table makes this fail instead of being cleared too
+                cur.execute("TRUNCATE metadata.agent_tool, metadata.agent RESTART IDENTITY;")
                 print("Data cleared.")
             
+            agent_rows = []
+            tool_rows = []
+            agent_tool_rows = []
             for agent_name in agent_dirs:
-                print(f"Syncing agent: {agent_name}")
-                agent_data = read_agent_files(agent_name)
-                agent_id = create_agent_with_id(conn, agent_data)
-                print(f"Successfully synced agent: {agent_name} (ID: {agent_id})")
+                print(f"Reading agent: {agent_name}")
+                agent_row, agent_tools, agent_tool_links = create_agent_with_id(read_agent_files(agent_name))
+                agent_rows.append(agent_row)
+                tool_rows.extend(agent_tools)
+                agent_tool_rows.extend(agent_tool_links)
+
+            with conn.cursor() as cur:
+                # Skip FK and trigger checks for the bulk load; every referenced row is loaded
+                # in this same transaction. SET LOCAL reverts to DEFAULT at commit/rollback.
+                cur.execute("SET LOCAL session_replication_role = replica;")
+
+                # Agents were just cleared, so they can be streamed in with COPY
+                copy_rows(cur, 'metadata.agent',
+                          ['id', 'name', 'description', '"systemPrompt"', '"llmModelId"', '"isDefault"'],
+                          agent_rows)
+
+                # Tools are not cleared and may be shared between agents, so keep conflict handling.
+                # Each column is bound as one array and expanded server-side with unnest.
+                if tool_rows:
+                    cur.execute("""
+                        INSERT INTO metadata.tool
+                        (id, "toolName", "descriptionForLlm", "jsonSchema", "toolType", "isSystemTool", "internalApiPath")
+                        SELECT * FROM unnest(
+                            %s::uuid[], %s::text[], %s::text[], %s::jsonb[], %s::text[], %s::bool[], %s::text[]
+                        )
+                        ON CONFLICT (id) DO NOTHING
+                    """, [list(column) for column in zip(*tool_rows)])
+
+                # agent_tool ids fall back to the column default (uuid_generate_v4())
+                if agent_tool_rows:
+                    cur.execute("""
+                        INSERT INTO metadata.agent_tool
+                        ("agentId", "toolId")
+                        SELECT * FROM unnest(%s::uuid[], %s::uuid[])
+                        ON CONFLICT ("agentId", "toolId") DO NOTHING
+                    """, [list(column) for column in zip(*agent_tool_rows)])
+
+            for agent_row in agent_rows:
+                print(f"Successfully synced agent: {agent_row[1]} (ID: {agent_row[0]})")
             
             conn.commit()
         
@@ -15,26 +15,12 @@ def drop_execution_location_column():
     try:
         conn = get_db_connection()
         with conn.cursor() as cur:
-            print("Checking for 'execution_location' column in 'metadata.tool' table...")
-            # Check if the column exists
+            print("Dropping 'execution_location' column from 'metadata.tool' table if it exists...")
             cur.execute("""
-                SELECT 1
-                FROM information_schema.columns
-                WHERE table_schema = 'metadata'
-                  AND table_name = 'tool'
-                  AND column_name = 'execution_location';
+                ALTER TABLE metadata.tool
+                DROP COLUMN IF EXISTS "execution_location";
             """)
-            exists = cur.fetchone()
-
-            if not exists:
-                print("'execution_location' column does not exist. No action needed.")
-            else:
-                print("Column found. Dropping 'execution_location' column...")
-                cur.execute("""
-                    ALTER TABLE metadata.tool
-                    DROP COLUMN "execution_location";
-                """)
-                print("'execution_location' column dropped successfully.")
+            print("'execution_location' column is absent.")
             
             conn.commit()
             
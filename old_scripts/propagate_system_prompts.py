@@ -1,60 +1,83 @@
 import json
 import os
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library json module
+    orjson = None
+
+# Reusable encoder/decoder for the standard library fallback, built once instead of per agent
+_json_decode = json.JSONDecoder().decode
+_json_encode = json.JSONEncoder(indent=2, ensure_ascii=False).encode
+
+def update_agent_system_prompt(agents_dir, agent_folder):
+    """Update the system message in a single agent's jsonSchema.json from its systemPrompt.md."""
+    try:
+        # Construct paths
+        system_prompt_path = os.path.join(agents_dir, agent_folder, 'systemPrompt.md')
+        schema_path = os.path.join(agents_dir, agent_folder, 'jsonSchema.json')
+        
+        # Read system prompt and schema, skipping if either file doesn't exist
+        try:
+            with open(system_prompt_path, 'r', encoding='utf-8') as f:
+                system_prompt = f.read().strip()
+            
+            with open(schema_path, 'rb') as f:
+                data = f.read()
+            schema = orjson.loads(data) if orjson else _json_decode(data.decode('utf-8'))
+        except FileNotFoundError:
+            print(f"Skipping {agent_folder}: Missing required files")
+            return
+        
+        # Ensure messages array exists
+        if 'messages' not in schema:
+            schema['messages'] = []
+        
+        # Find or create system message
+        system_message = next(
+            (msg for msg in schema['messages'] if msg.get('role') == 'system'),
+            None
+        )
+        
+        if system_message and system_message.get('content') == system_prompt:
+            # Already up to date; skip the rewrite
+            print(f"System message in {agent_folder}/jsonSchema.json is already up to date")
+            return
+        
+        if system_message:
+            # Update existing system message
+            system_message['content'] = system_prompt
+        else:
+            # Add new system message
+            schema['messages'].append({
+                'role': 'system',
+                'content': system_prompt
+            })
+        
+        # Write back to file
+        with open(schema_path, 'wb') as f:
+            if orjson:
+                f.write(orjson.dumps(schema, option=orjson.OPT_INDENT_2))
+            else:
+                f.write(_json_encode(schema).encode('utf-8'))
+            
+        print(f"Successfully updated system message in {agent_folder}/jsonSchema.json")
+        
+    except Exception as e:
+        print(f"Error processing {agent_folder}: {str(e)}")
 
 def update_system_prompts():
     """Update the system message in jsonSchema.json with the content from systemPrompt.md for all agents."""
     agents_dir = 'agents'
     
     # Get all immediate subdirectories in the agents directory
-    agent_folders = [f for f in os.listdir(agents_dir) if os.path.isdir(os.path.join(agents_dir, f))]
+    with os.scandir(agents_dir) as entries:
+        agent_folders = [entry.name for entry in entries if entry.is_dir()]
     
-    for agent_folder in agent_folders:
-        try:
-            # Construct paths
-            system_prompt_path = os.path.join(agents_dir, agent_folder, 'systemPrompt.md')
-            schema_path = os.path.join(agents_dir, agent_folder, 'jsonSchema.json')
-            
-            # Skip if either file doesn't exist
-            if not os.path.exists(system_prompt_path) or not os.path.exists(schema_path):
-                print(f"Skipping {agent_folder}: Missing required files")
-                continue
-            
-            # Read system prompt
-            with open(system_prompt_path, 'r') as f:
-                system_prompt = f.read().strip()
-            
-            # Read and update schema
-            with open(schema_path, 'r') as f:
-                schema = json.load(f)
-            
-            # Ensure messages array exists
-            if 'messages' not in schema:
-                schema['messages'] = []
-            
-            # Find or create system message
-            system_message = next(
-                (msg for msg in schema['messages'] if msg.get('role') == 'system'),
-                None
-            )
-            
-            if system_message:
-                # Update existing system message
-                system_message['content'] = system_prompt
-            else:
-                # Add new system message
-                schema['messages'].append({
-                    'role': 'system',
-                    'content': system_prompt
-                })
-            
-            # Write back to file
-            with open(schema_path, 'w') as f:
-                json.dump(schema, f, indent=2)
-                
-            print(f"Successfully updated system message in {agent_folder}/jsonSchema.json")
-            
-        except Exception as e:
-            print(f"Error processing {agent_folder}: {str(e)}")
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(partial(update_agent_system_prompt, agents_dir), agent_folders))
 
 if __name__ == "__main__":
     update_system_prompts() 
\ No newline at end of file
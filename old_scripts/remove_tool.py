@@ -4,59 +4,64 @@ import os
 import sys
 import json
 import uuid
-import psycopg2
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
+from sync_from_db import get_db_connection, sync_agent_from_db
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library json module
+    orjson = None
 
 # Load environment variables
 load_dotenv('local.env')
 
-def get_db_connection():
-    """Create a database connection using environment variables."""
-    return psycopg2.connect(os.getenv('PG_DATABASE_URL'))
-
-def remove_tool_from_agent(agent_id, tool_id, delete_tool=False):
+def remove_tool_from_agent(conn, agent_id, tool_id, delete_tool=False):
     """Remove a tool from an agent and optionally delete the tool."""
-    with get_db_connection() as conn:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # First, get the agent name
-            cur.execute("""
-                SELECT name FROM metadata.agent WHERE id = %s
-            """, (agent_id,))
-            result = cur.fetchone()
-            if not result:
-                raise Exception(f"Agent with ID {agent_id} not found")
-            agent_name = result['name']
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        # First, get the agent name
+        cur.execute("""
+            SELECT name FROM metadata.agent WHERE id = %s
+        """, (agent_id,))
+        result = cur.fetchone()
+        if not result:
+            raise Exception(f"Agent with ID {agent_id} not found")
+        agent_name = result['name']
+
+        # Remove the agent-tool association
+        cur.execute("""
+            DELETE FROM metadata.agent_tool 
+            WHERE "agentId" = %s AND "toolId" = %s
+        """, (agent_id, tool_id))
 
-            # Remove the agent-tool association
+        # If delete_tool is True, delete the tool
+        if delete_tool:
             cur.execute("""
-                DELETE FROM metadata.agent_tool 
-                WHERE "agentId" = %s AND "toolId" = %s
-            """, (agent_id, tool_id))
+                DELETE FROM metadata.tool 
+                WHERE id = %s
+            """, (tool_id,))
 
-            # If delete_tool is True, delete the tool
-            if delete_tool:
-                cur.execute("""
-                    DELETE FROM metadata.tool 
-                    WHERE id = %s
-                """, (tool_id,))
+        conn.commit()
 
-            conn.commit()
+        # Update the agent's jsonSchema.json
+        schema_path = os.path.join('agents', agent_name, 'jsonSchema.json')
+        
+        # Read existing schema
+        with open(schema_path, 'rb') as f:
+            schema = orjson.loads(f.read()) if orjson else json.load(f)
+        
+        # Remove the tool from the schema
+        if 'tools' in schema:
+            schema['tools'] = [tool for tool in schema['tools'] if tool.get('toolId') != tool_id]
+        
+        # Write updated schema
+        with open(schema_path, 'wb') as f:
+            if orjson:
+                f.write(orjson.dumps(schema, option=orjson.OPT_INDENT_2))
+            else:
+                f.write(json.dumps(schema, indent=2).encode('utf-8'))
 
-            # Update the agent's jsonSchema.json
-            schema_path = os.path.join('agents', agent_name, 'jsonSchema.json')
-            
-            # Read existing schema
-            with open(schema_path, 'r') as f:
-                schema = json.load(f)
-            
-            # Remove the tool from the schema
-            if 'tools' in schema:
-                schema['tools'] = [tool for tool in schema['tools'] if tool.get('toolId') != tool_id]
-            
-            # Write updated schema
-            with open(schema_path, 'w') as f:
-                json.dump(schema, f, indent=2)
+        return agent_name
 
 def main():
     """Main function to remove a tool from an agent."""
@@ -70,14 +75,15 @@ def main():
         # Ask if tool should be deleted
         delete_tool = input("Delete the tool? (y/N): ").strip().lower() == 'y'
         
-        # Remove tool from agent
-        remove_tool_from_agent(agent_id, tool_id, delete_tool)
-        print(f"Successfully removed tool {tool_id} from agent {agent_id}")
-        if delete_tool:
-            print("Tool was also deleted from the database")
-        
-        # Run sync_from_db to ensure everything is in sync
-        os.system(f"python src/sync_from_db.py {agent_id}")
+        # Remove tool from agent, reusing one connection for the lookup and the deletes
+        with get_db_connection() as conn:
+            agent_name = remove_tool_from_agent(conn, agent_id, tool_id, delete_tool)
+            print(f"Successfully removed tool {tool_id} from agent {agent_id}")
+            if delete_tool:
+                print("Tool was also deleted from the database")
+            
+            # Sync the agent back from the database in-process to ensure everything is in sync
+            sync_agent_from_db(conn, agent_name)
         
     except Exception as e:
         print(f"Error removing tool: {str(e)}")
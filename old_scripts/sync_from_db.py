@@ -1,83 +1,128 @@
 import os
 import json
-import psycopg2
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library json module
+    orjson = None
+
 # Load environment variables
 load_dotenv('local.env')
 
+_pool = None
+
+def get_db_pool():
+    """Get the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = ThreadedConnectionPool(1, 16, os.getenv('PG_DATABASE_URL'))
+    return _pool
+
+@contextmanager
 def get_db_connection():
-    """Create a database connection using environment variables."""
-    return psycopg2.connect(os.getenv('PG_DATABASE_URL'))
+    """Borrow a pooled connection; commits on success and rolls back on error like `with conn`."""
+    pool = get_db_pool()
+    conn = pool.getconn()
+    try:
+        with conn:
+            yield conn
+    finally:
+        pool.putconn(conn)
 
-def sync_agent_from_db(agent):
-    """Sync a single agent from database to local files."""
-    with get_db_connection() as conn:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # Get agent details
-            cur.execute("""
-                SELECT a.*, 
-                       json_agg(
-                           json_build_object(
-                               'toolId', t.id,
-                               'type', t."toolType",
-                               'function', json_build_object(
-                                   'name', t."toolName",
-                                   'description', t."descriptionForLlm",
-                                   'parameters', t."jsonSchema"
-                               ),
-                               'internalApiPath', t."internalApiPath"
-                           )
-                       ) as tools
-                FROM metadata.agent a
-                LEFT JOIN metadata.agent_tool at ON a.id = at."agentId"
-                LEFT JOIN metadata.tool t ON t.id = at."toolId"
-                WHERE a.name = %s
-                GROUP BY a.id
-            """, (agent,))
-            
-            result = cur.fetchone()
-            if not result:
-                print(f"Agent {agent} not found in database")
-                return
-            
-            # Create agent directory if it doesn't exist
-            agent_dir = os.path.join('agents', agent)
-            os.makedirs(agent_dir, exist_ok=True)
-            
-            # Write system prompt
-            with open(os.path.join(agent_dir, 'systemPrompt.md'), 'w') as f:
-                f.write(result['systemPrompt'])
-            
-            # Prepare schema
-            schema = {
-                'agentId': result['id'],
-                'description': result['description'] or '',
-                'messages': [
-                    {
-                        'role': 'system',
-                        'content': result['systemPrompt']
-                    }
-                ],
-                'tools': [tool for tool in result['tools'] if tool['toolId'] is not None]
+AGENTS_QUERY = """
+    SELECT a.*, 
+           json_agg(
+               json_build_object(
+                   'toolId', t.id,
+                   'type', t."toolType",
+                   'function', json_build_object(
+                       'name', t."toolName",
+                       'description', t."descriptionForLlm",
+                       'parameters', t."jsonSchema"
+                   ),
+                   'internalApiPath', t."internalApiPath"
+               )
+           ) as tools
+    FROM metadata.agent a
+    LEFT JOIN metadata.agent_tool at ON a.id = at."agentId"
+    LEFT JOIN metadata.tool t ON t.id = at."toolId"
+    WHERE a.name = ANY(%s)
+    GROUP BY a.id
+"""
+
+def fetch_agents(conn, agent_names):
+    """Fetch the given agents and their tools from the database in a single query."""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(AGENTS_QUERY, (list(agent_names),))
+        return cur.fetchall()
+
+def write_agent_files(result):
+    """Write an agent row fetched from the database to local files."""
+    # Create agent directory if it doesn't exist
+    agent_dir = os.path.join('agents', result['name'])
+    os.makedirs(agent_dir, exist_ok=True)
+    
+    # Write system prompt
+    with open(os.path.join(agent_dir, 'systemPrompt.md'), 'w') as f:
+        f.write(result['systemPrompt'])
+    
+    # Prepare schema
+    schema = {
+        'agentId': result['id'],
+        'description': result['description'] or '',
+        'messages': [
+            {
+                'role': 'system',
+                'content': result['systemPrompt']
             }
-            
-            # Write JSON schema
-            with open(os.path.join(agent_dir, 'jsonSchema.json'), 'w') as f:
-                json.dump(schema, f, indent=2)
+        ],
+        'tools': [tool for tool in result['tools'] if tool['toolId'] is not None]
+    }
+    
+    # Write JSON schema
+    with open(os.path.join(agent_dir, 'jsonSchema.json'), 'wb') as f:
+        if orjson:
+            f.write(orjson.dumps(schema, option=orjson.OPT_INDENT_2))
+        else:
+            f.write(json.dumps(schema, indent=2).encode('utf-8'))
+
+def sync_agent_from_db(conn, agent):
+    """Sync a single agent from database to local files."""
+    results = fetch_agents(conn, [agent])
+
+    if not results:
+        print(f"Agent {agent} not found in database")
+        return
+
+    write_agent_files(results[0])
 
 def main():
     """Main function to sync all agents from DB to local files."""
     try:
         # Get all agent directories
-        agent_dirs = [d for d in os.listdir('agents') 
-                     if os.path.isdir(os.path.join('agents', d))]
+        with os.scandir('agents') as entries:
+            agent_dirs = [entry.name for entry in entries if entry.is_dir()]
         
+        # Fetch every agent in one round trip
+        with get_db_connection() as conn:
+            results = fetch_agents(conn, agent_dirs)
+
+        found = {result['name'] for result in results}
         for agent_name in agent_dirs:
-            print(f"Syncing agent: {agent_name}")
-            sync_agent_from_db(agent_name)
-            print(f"Successfully synced agent: {agent_name}")
+            if agent_name not in found:
+                print(f"Agent {agent_name} not found in database")
+
+        def write_one(result):
+            write_agent_files(result)
+            print(f"Successfully synced agent: {result['name']}")
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            list(executor.map(write_one, results))
         
         print("All agents synced successfully!")
     except Exception as e:
@@ -85,4 +130,4 @@ def main():
         raise
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
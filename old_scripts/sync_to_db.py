@@ -1,9 +1,22 @@
 import os
 import json
+import mmap
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, Json, execute_values
 from dotenv import load_dotenv
 import uuid
+from collections import Counter
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library json module
+    orjson = None
+
+# Serializer handed to psycopg2's Json adapter for jsonb parameters
+json_dumps = (lambda obj: orjson.dumps(obj).decode('utf-8')) if orjson else json.dumps
+
+# Prefault schema mappings up front (MAP_POPULATE) on platforms that support it
+MMAP_READ_FLAGS = (mmap.MAP_PRIVATE | getattr(mmap, 'MAP_POPULATE', 0)) if hasattr(mmap, 'MAP_PRIVATE') else None
 
 # Load environment variables
 load_dotenv('local.env')
@@ -12,17 +25,32 @@ def get_db_connection():
     """Create a database connection using environment variables."""
     return psycopg2.connect(os.getenv('PG_DATABASE_URL'))
 
+def load_json_file(path):
+    """Parse a JSON file through a read-only memory map instead of reading it into a str."""
+    with open(path, 'rb') as f:
+        fd = f.fileno()
+        if not os.fstat(fd).st_size:
+            return json.loads(b'')  # mmap can't map an empty file; raise the usual JSONDecodeError
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        if MMAP_READ_FLAGS is None:
+            mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        else:
+            mm = mmap.mmap(fd, 0, flags=MMAP_READ_FLAGS, prot=mmap.PROT_READ)
+        with mm:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            if orjson:
+                with memoryview(mm) as view:
+                    return orjson.loads(view)
+            return json.loads(mm[:])
+
 def read_agent_files(agent_name):
     """Read agent files from local directory."""
     agent_dir = os.path.join('agents', agent_name)
     
-    # Read system prompt
-    with open(os.path.join(agent_dir, 'systemPrompt.md'), 'r') as f:
-        system_prompt = f.read().strip()
-    
     # Read JSON schema
-    with open(os.path.join(agent_dir, 'jsonSchema.json'), 'r') as f:
-        schema = json.load(f)
+    schema = load_json_file(os.path.join(agent_dir, 'jsonSchema.json'))
     
     # Extract system message from schema if it exists
     system_message = next(
@@ -30,8 +58,12 @@ def read_agent_files(agent_name):
         None
     )
     
-    # Use system message content if available, otherwise use the markdown file
-    system_prompt = system_message['content'] if system_message else system_prompt
+    # Use system message content if available, otherwise fall back to the markdown file
+    if system_message:
+        system_prompt = system_message['content']
+    else:
+        with open(os.path.join(agent_dir, 'systemPrompt.md'), 'r') as f:
+            system_prompt = f.read().strip()
     
     return {
         'name': agent_name,
@@ -43,115 +75,120 @@ def upsert_agent(conn, agent_data):
     """Insert or update an agent and its tools in the database using the local JSON as the source of truth."""
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
         # --- Upsert Agent ---
-        cur.execute("SELECT id FROM metadata.agent WHERE name = %s", (agent_data['name'],))
-        result = cur.fetchone()
-        agent_id = None
-        if result:
-            agent_id = result['id']
-            # Update existing agent
-            cur.execute("""
-                UPDATE metadata.agent 
+        # Agents are matched by name, which has no unique constraint to target with ON CONFLICT,
+        # so the UPDATE and the fallback INSERT run as one data-modifying CTE.
+        description = agent_data['schema'].get('description', '')
+        cur.execute("""
+            WITH updated AS (
+                UPDATE metadata.agent
                 SET "systemPrompt" = %s, description = %s, "updatedAt" = NOW()
-                WHERE id = %s
-            """, (agent_data['systemPrompt'], agent_data['schema'].get('description', ''), agent_id))
-        else:
-            # Insert new agent
-            agent_id = agent_data['schema'].get('agentId', str(uuid.uuid4()))
-            cur.execute("""
+                WHERE name = %s
+                RETURNING id
+            ), inserted AS (
                 INSERT INTO metadata.agent (id, name, description, "systemPrompt", "llmModelId", "isDefault")
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
-                agent_id, agent_data['name'], agent_data['schema'].get('description', ''),
-                agent_data['systemPrompt'], 'gpt-4', False
-            ))
+                SELECT %s, %s, %s, %s, %s, %s
+                WHERE NOT EXISTS (SELECT 1 FROM updated)
+                RETURNING id
+            )
+            SELECT id FROM updated UNION ALL SELECT id FROM inserted LIMIT 1
+        """, (
+            agent_data['systemPrompt'], description, agent_data['name'],
+            agent_data['schema']['agentId'] if 'agentId' in agent_data['schema'] else str(uuid.uuid4()),
+            agent_data['name'], description,
+            agent_data['systemPrompt'], 'gpt-4', False
+        ))
+        agent_id = cur.fetchone()['id']
 
         # --- Upsert Tools and Associations ---
         schema_tools = agent_data['schema'].get('tools', [])
-        schema_tool_ids = set()
-
-        if schema_tools:
-            for tool_data in schema_tools:
-                tool_function = tool_data.get('function', {})
-                tool_name = tool_function.get('name')
-
-                if not tool_name:
-                    continue
-
-                # The user's system expects the entire tool object to be stored in the jsonSchema column.
-                json_schema_blob = tool_data
-
-                # --- Tool Upsert Logic ---
-                # The primary identifier for a tool is its ID. We check for existence based on the toolId from the JSON file.
-                tool_id_str = tool_data.get('toolId')
-                tool_id = uuid.UUID(tool_id_str) if tool_id_str else uuid.uuid4()
-
-                cur.execute('SELECT id FROM metadata.tool WHERE id = %s', (str(tool_id),))
-                result = cur.fetchone()
-
-                if result:
-                    # Tool exists, update it.
-                    # Note: We ensure the toolName is also updated, in case it changed in the JSON.
-                    cur.execute("""
-                        UPDATE metadata.tool SET
-                            "toolName" = %s, "descriptionForLlm" = %s, "jsonSchema" = %s,
-                            "toolType" = %s, "internalApiPath" = %s, "isSystemTool" = %s,
-                            "updatedAt" = NOW()
-                        WHERE id = %s;
-                    """, (
-                        tool_name, tool_function.get('description'), json.dumps(json_schema_blob),
-                        tool_data.get('type'), tool_data.get('internalApiPath'), True,
-                        str(tool_id)
-                    ))
-                else:
-                    # Tool does not exist, insert it.
-                    cur.execute("""
-                        INSERT INTO metadata.tool (id, "toolName", "descriptionForLlm", "jsonSchema", "toolType", "internalApiPath", "isSystemTool")
-                        VALUES (%s, %s, %s, %s, %s, %s, %s);
-                    """, (
-                        str(tool_id), tool_name, tool_function.get('description'), json.dumps(json_schema_blob),
-                        tool_data.get('type'), tool_data.get('internalApiPath'), True
-                    ))
-
-                schema_tool_ids.add(str(tool_id))
-
-                # Create association if it doesn't exist
-                cur.execute("""
-                    INSERT INTO metadata.agent_tool (id, "agentId", "toolId")
-                    SELECT %s, %s, %s
-                    WHERE NOT EXISTS (
-                        SELECT 1 FROM metadata.agent_tool WHERE "agentId" = %s AND "toolId" = %s
-                    );
-                """, (str(uuid.uuid4()), agent_id, str(tool_id), agent_id, str(tool_id)))
-        
-        # --- De-associate Old Tools ---
-        cur.execute('SELECT "toolId" FROM metadata.agent_tool WHERE "agentId" = %s', (agent_id,))
-        db_tool_ids = {str(row['toolId']) for row in cur.fetchall()}
-
-        tools_to_remove = db_tool_ids - schema_tool_ids
-        if tools_to_remove:
-            # Note: Explicitly casting to uuid[] to avoid type errors with psycopg2
-            cur.execute(
-                'DELETE FROM metadata.agent_tool WHERE "agentId" = %s AND "toolId" = ANY(ARRAY[%s]::uuid[]);',
-                (agent_id, [str(t) for t in tools_to_remove])
+        # Keyed by tool id so a tool listed twice is only upserted once per statement
+        tool_rows = {}
+
+        for tool_data in schema_tools:
+            tool_function = tool_data.get('function', {})
+            tool_name = tool_function.get('name')
+
+            if not tool_name:
+                continue
+
+            # The user's system expects the entire tool object to be stored in the jsonSchema column.
+            json_schema_blob = tool_data
+
+            # The primary identifier for a tool is its ID, taken from the toolId in the JSON file.
+            # Passed through as text; PostgreSQL casts it to uuid
+            tool_id = tool_data.get('toolId') or str(uuid.uuid4())
+
+            tool_rows[tool_id] = (
+                tool_id, tool_name, tool_function.get('description'),
+                Json(json_schema_blob, dumps=json_dumps),
+                tool_data.get('type'), tool_data.get('internalApiPath'), True
             )
-            print(f"De-associated {len(tools_to_remove)} tools from agent {agent_data['name']}.")
 
-        return agent_id
+        schema_tool_ids = set(tool_rows)
+
+        if tool_rows:
+            # Insert new tools and update existing ones in a single statement.
+            # Note: We ensure the toolName is also updated, in case it changed in the JSON.
+            execute_values(cur, """
+                INSERT INTO metadata.tool (id, "toolName", "descriptionForLlm", "jsonSchema", "toolType", "internalApiPath", "isSystemTool")
+                VALUES %s
+                ON CONFLICT (id) DO UPDATE SET
+                    "toolName" = EXCLUDED."toolName", "descriptionForLlm" = EXCLUDED."descriptionForLlm",
+                    "jsonSchema" = EXCLUDED."jsonSchema", "toolType" = EXCLUDED."toolType",
+                    "internalApiPath" = EXCLUDED."internalApiPath", "isSystemTool" = EXCLUDED."isSystemTool",
+                    "updatedAt" = NOW();
+            """, list(tool_rows.values()), page_size=500)
+
+            # Create associations that don't exist yet (UQ_agent_tool covers ("agentId", "toolId"))
+            execute_values(cur, """
+                INSERT INTO metadata.agent_tool ("agentId", "toolId")
+                VALUES %s
+                ON CONFLICT ("agentId", "toolId") DO NOTHING;
+            """, [(agent_id, tool_id) for tool_id in schema_tool_ids], page_size=500)
+        
+        return agent_id, schema_tool_ids
+
+def remove_stale_associations(conn, synced_agents):
+    """De-associate tools no longer listed in their agent's schema, for every synced agent in one DELETE."""
+    agent_ids = list(synced_agents)
+    keep_agent_ids = [agent_id for agent_id, (_, tool_ids) in synced_agents.items() for _ in tool_ids]
+    keep_tool_ids = [tool_id for _, tool_ids in synced_agents.values() for tool_id in tool_ids]
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            DELETE FROM metadata.agent_tool at
+            WHERE at."agentId" = ANY(%s::uuid[])
+              AND NOT EXISTS (
+                  SELECT 1 FROM unnest(%s::uuid[], %s::uuid[]) AS keep("agentId", "toolId")
+                  WHERE keep."agentId" = at."agentId" AND keep."toolId" = at."toolId"
+              )
+            RETURNING at."agentId";
+        """, (agent_ids, keep_agent_ids, keep_tool_ids))
+        removed = Counter(str(row[0]) for row in cur.fetchall())
+
+    for agent_id, count in removed.items():
+        print(f"De-associated {count} tools from agent {synced_agents[agent_id][0]}.")
 
 def main():
     """Main function to sync all local agents to DB."""
     try:
         # Get all agent directories
-        agent_dirs = [d for d in os.listdir('agents') 
-                     if os.path.isdir(os.path.join('agents', d))]
+        with os.scandir('agents') as entries:
+            agent_dirs = [entry.name for entry in entries if entry.is_dir()]
         
         with get_db_connection() as conn:
+            # agent_id -> (agent name, tool ids listed in its schema)
+            synced_agents = {}
             for agent_name in agent_dirs:
                 print(f"Syncing agent: {agent_name}")
                 agent_data = read_agent_files(agent_name)
-                agent_id = upsert_agent(conn, agent_data)
+                agent_id, tool_ids = upsert_agent(conn, agent_data)
+                synced_agents[str(agent_id)] = (agent_name, tool_ids)
                 print(f"Successfully synced agent: {agent_name} (ID: {agent_id})")
             
+            if synced_agents:
+                remove_stale_associations(conn, synced_agents)
+            
             conn.commit()
         
         print("All agents synced successfully!")
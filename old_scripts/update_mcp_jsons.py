@@ -1,14 +1,44 @@
 import os
 import json
+import functools
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, bindparam
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library json module
+    orjson = None
+
 # Load environment variables
 load_dotenv()
 
+@functools.lru_cache(maxsize=512)
+def _read_text_cached(path: str, mtime_ns: int, size: int) -> str:
+    """Read a text file; mtime and size are part of the cache key so edits invalidate it."""
+    with open(path, "r") as f:
+        return f.read()
+
+def write_file_if_changed(path: Path, data: bytes) -> bool:
+    """Write data to path unless the file already holds exactly these bytes."""
+    try:
+        if os.stat(path).st_size == len(data) and path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+    return True
+
 class MCPGenerator:
     def __init__(self):
         # Database connection
@@ -22,70 +52,98 @@ class MCPGenerator:
         # Base paths
         self.agents_path = Path("agents")
         
-    def get_agent_data_from_db(self, agent_id: str) -> Dict:
-        """Fetch agent data from the database."""
+    def get_agents_data_from_db(self, agent_ids: List[str]) -> Dict[str, Dict]:
+        """Fetch agent data for several agents at once, keyed by agent_id."""
         with self.Session() as session:
-            # Get agent profile
+            params = {"agent_ids": list(agent_ids)}
+            
+            # Get agent profiles
             agent_query = text("""
                 SELECT * FROM agents 
-                WHERE agent_id = :agent_id
-            """)
-            agent_result = session.execute(agent_query, {"agent_id": agent_id}).fetchone()
-            
-            if not agent_result:
-                raise ValueError(f"Agent {agent_id} not found in database")
+                WHERE agent_id IN :agent_ids
+            """).bindparams(bindparam("agent_ids", expanding=True))
+            agents_result = session.execute(agent_query, params).fetchall()
             
-            # Get agent's tools
+            # Get the agents' tools, tagged with the agent they are linked to
             tools_query = text("""
-                SELECT t.* 
+                SELECT t.*, at.agent_id AS _linked_agent_id
                 FROM tools t
                 JOIN agent_tools at ON t.tool_id = at.tool_id
-                WHERE at.agent_id = :agent_id
-            """)
-            tools_result = session.execute(tools_query, {"agent_id": agent_id}).fetchall()
+                WHERE at.agent_id IN :agent_ids
+            """).bindparams(bindparam("agent_ids", expanding=True))
+            tools_result = session.execute(tools_query, params).fetchall()
             
             # Get tool configurations if any
             tool_configs_query = text("""
                 SELECT * FROM user_custom_tool_configurations
-                WHERE agent_id = :agent_id
-            """)
-            tool_configs = session.execute(tool_configs_query, {"agent_id": agent_id}).fetchall()
-            
-            return {
-                "agent": dict(agent_result),
-                "tools": [dict(tool) for tool in tools_result],
-                "tool_configs": [dict(config) for config in tool_configs]
-            }
+                WHERE agent_id IN :agent_ids
+            """).bindparams(bindparam("agent_ids", expanding=True))
+            tool_configs = session.execute(tool_configs_query, params).fetchall()
+        
+        data = {
+            str(agent["agent_id"]): {"agent": dict(agent), "tools": [], "tool_configs": []}
+            for agent in agents_result
+        }
+        for tool in tools_result:
+            tool = dict(tool)
+            agent_data = data.get(str(tool.pop("_linked_agent_id")))
+            if agent_data:
+                agent_data["tools"].append(tool)
+        for config in tool_configs:
+            agent_data = data.get(str(config["agent_id"]))
+            if agent_data:
+                agent_data["tool_configs"].append(dict(config))
+        
+        return data
+    
+    def get_agent_data_from_db(self, agent_id: str) -> Dict:
+        """Fetch agent data from the database."""
+        agent_data = self.get_agents_data_from_db([agent_id]).get(agent_id)
+        if not agent_data:
+            raise ValueError(f"Agent {agent_id} not found in database")
+        return agent_data
     
     def read_system_prompt(self, agent_path: Path) -> str:
         """Read the system prompt from the agent's directory."""
         prompt_path = agent_path / "prompts" / "system_prompt.md"
-        if not prompt_path.exists():
+        try:
+            stat = os.stat(prompt_path)
+        except FileNotFoundError:
             raise FileNotFoundError(f"System prompt not found at {prompt_path}")
         
-        with open(prompt_path, "r") as f:
-            return f.read()
+        return _read_text_cached(str(prompt_path), stat.st_mtime_ns, stat.st_size)
     
-    def generate_mcp_json(self, agent_id: str) -> Dict:
+    def _try_read_system_prompt(self, agent_path: Path):
+        """Read the system prompt, returning the exception instead of raising it."""
+        try:
+            return self.read_system_prompt(agent_path)
+        except Exception as e:
+            return e
+    
+    def generate_mcp_json(self, agent_id: str, system_prompt: Optional[str] = None,
+                          db_data: Optional[Dict] = None) -> Dict:
         """Generate MCP JSON for an agent by combining local files and database data."""
         agent_path = self.agents_path / agent_id
         if not agent_path.exists():
             raise FileNotFoundError(f"Agent directory not found: {agent_path}")
         
-        # Get data from database
-        db_data = self.get_agent_data_from_db(agent_id)
+        # Get data from database unless it was prefetched
+        if db_data is None:
+            db_data = self.get_agent_data_from_db(agent_id)
         
-        # Read system prompt
-        system_prompt = self.read_system_prompt(agent_path)
+        # Read system prompt unless it was prefetched
+        if system_prompt is None:
+            system_prompt = self.read_system_prompt(agent_path)
         
         # Combine tool configurations with tool definitions
+        # First configuration per tool wins, as with the previous linear scan
+        configs_by_tool = {}
+        for config in db_data["tool_configs"]:
+            configs_by_tool.setdefault(config["tool_id"], config)
+        
         tools = []
         for tool in db_data["tools"]:
-            tool_config = next(
-                (config for config in db_data["tool_configs"] 
-                 if config["tool_id"] == tool["tool_id"]),
-                None
-            )
+            tool_config = configs_by_tool.get(tool["tool_id"])
             
             if tool_config:
                 # Merge tool configuration with tool definition
@@ -107,21 +165,38 @@ class MCPGenerator:
         
         # Save MCP JSON
         mcp_path = agent_path / "configs" / "mcp.json"
-        with open(mcp_path, "w") as f:
-            json.dump(mcp_json, f, indent=2)
+        if orjson:
+            content = orjson.dumps(mcp_json, option=orjson.OPT_INDENT_2)
+        else:
+            content = json.dumps(mcp_json, indent=2).encode("utf-8")
+        write_file_if_changed(mcp_path, content)
         
         return mcp_json
     
     def update_all_agents(self):
         """Update MCP JSONs for all agents in the agents directory."""
-        for agent_dir in self.agents_path.iterdir():
-            if agent_dir.is_dir():
-                try:
-                    print(f"Updating MCP JSON for agent: {agent_dir.name}")
-                    self.generate_mcp_json(agent_dir.name)
-                    print(f"Successfully updated {agent_dir.name}")
-                except Exception as e:
-                    print(f"Error updating {agent_dir.name}: {str(e)}")
+        with os.scandir(self.agents_path) as entries:
+            agent_dirs = [Path(entry.path) for entry in entries if entry.is_dir()]
+        
+        # Prefetch system prompts concurrently; the DB work stays on this thread
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            prompts = list(executor.map(self._try_read_system_prompt, agent_dirs))
+        
+        # One query per table for every agent instead of three per agent
+        agents_data = self.get_agents_data_from_db([agent_dir.name for agent_dir in agent_dirs])
+        
+        for agent_dir, system_prompt in zip(agent_dirs, prompts):
+            try:
+                print(f"Updating MCP JSON for agent: {agent_dir.name}")
+                if isinstance(system_prompt, Exception):
+                    raise system_prompt
+                db_data = agents_data.get(agent_dir.name)
+                if not db_data:
+                    raise ValueError(f"Agent {agent_dir.name} not found in database")
+                self.generate_mcp_json(agent_dir.name, system_prompt, db_data)
+                print(f"Successfully updated {agent_dir.name}")
+            except Exception as e:
+                print(f"Error updating {agent_dir.name}: {str(e)}")
 
 def main():
     generator = MCPGenerator()
@@ -1,35 +1,72 @@
 import os
+import io
+import csv
 import json
+import mmap
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library json module
+    orjson = None
+
+# Prefault schema mappings up front (MAP_POPULATE) on platforms that support it
+MMAP_READ_FLAGS = (mmap.MAP_PRIVATE | getattr(mmap, 'MAP_POPULATE', 0)) if hasattr(mmap, 'MAP_PRIVATE') else None
+
 load_dotenv('local.env')
 
 def get_db_connection():
     """Create a database connection using environment variables."""
     return psycopg2.connect(os.getenv('PG_DATABASE_URL'))
 
-def update_tool_in_db(cur, tool_id, tool_schema):
-    """Updates the jsonSchema for a specific tool in the database."""
-    print(f"Updating tool {tool_id} in the database...")
-    cur.execute(
-        """
-        UPDATE metadata.tool
-        SET "jsonSchema" = %s, "updatedAt" = NOW()
-        WHERE id = %s;
-        """,
-        (json.dumps(tool_schema), tool_id),
-    )
-
-def process_agent_schema(cur, agent_name):
-    """Processes a single agent's jsonSchema.json file."""
+def load_json_file(path):
+    """Parse a JSON file through a read-only memory map instead of reading it into a str."""
+    with open(path, 'rb') as f:
+        fd = f.fileno()
+        if not os.fstat(fd).st_size:
+            return json.loads(b'')  # mmap can't map an empty file; raise the usual JSONDecodeError
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        if MMAP_READ_FLAGS is None:
+            mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        else:
+            mm = mmap.mmap(fd, 0, flags=MMAP_READ_FLAGS, prot=mmap.PROT_READ)
+        with mm:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            if orjson:
+                with memoryview(mm) as view:
+                    return orjson.loads(view)
+            return json.loads(mm[:])
+
+def stage_tool_updates(cur, updates):
+    """Stream (tool_id, jsonSchema) rows into a temp table with COPY and apply them in one UPDATE."""
+    cur.execute("""
+        CREATE TEMP TABLE _tool_updates (id uuid PRIMARY KEY, schema jsonb) ON COMMIT DROP;
+    """)
+
+    buf = io.StringIO()
+    csv.writer(buf).writerows(updates)
+    buf.seek(0)
+    cur.copy_expert("COPY _tool_updates (id, schema) FROM STDIN WITH (FORMAT csv)", buf)
+
+    cur.execute("""
+        UPDATE metadata.tool t
+        SET "jsonSchema" = u.schema, "updatedAt" = NOW()
+        FROM _tool_updates u
+        WHERE t.id = u.id;
+    """)
+    return cur.rowcount
+
+def process_agent_schema(agent_name, updates):
+    """Processes a single agent's jsonSchema.json file, queueing its tool updates."""
     schema_path = os.path.join('agents', agent_name, 'jsonSchema.json')
     print(f"Processing schema: {schema_path}")
 
     try:
-        with open(schema_path, 'r') as f:
-            schema = json.load(f)
+        schema = load_json_file(schema_path)
     except FileNotFoundError:
         print(f"  - Schema file not found. Skipping.")
         return 0
@@ -50,7 +87,8 @@ def process_agent_schema(cur, agent_name):
             continue
         
         # Here, we pass the entire tool object into the jsonSchema field
-        update_tool_in_db(cur, tool_id, tool)
+        print(f"Updating tool {tool_id} in the database...")
+        updates[tool_id] = orjson.dumps(tool).decode('utf-8') if orjson else json.dumps(tool)
         update_count += 1
     
     return update_count
@@ -60,12 +98,18 @@ def main():
     total_updated = 0
     conn = None
     try:
-        agent_dirs = [d for d in os.listdir('agents') if os.path.isdir(os.path.join('agents', d))]
+        with os.scandir('agents') as entries:
+            agent_dirs = [entry.name for entry in entries if entry.is_dir()]
         
         conn = get_db_connection()
+        # Keyed by tool id; a tool shared by several agents is staged once (last one wins, as before)
+        updates = {}
+        for agent_name in agent_dirs:
+            total_updated += process_agent_schema(agent_name, updates)
+
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            for agent_name in agent_dirs:
-                total_updated += process_agent_schema(cur, agent_name)
+            if updates:
+                stage_tool_updates(cur, list(updates.items()))
             
             if total_updated > 0:
                 print(f"Committing changes to the database...")
@@ -0,0 +1,9 @@
+"""
+Entry point for `python -m src`.
+Equivalent to `python -m src.cli`, but cli is imported as a regular module, so its compiled
+bytecode is cached in __pycache__ instead of being recompiled from source on every run.
+"""
+
+from .cli import main
+
+main()
@@ -4,42 +4,92 @@ Handles creation, syncing, and management of agents with dual scope support.
 """
 
 import os
-import json
 import uuid
-from typing import Dict, List, Optional, Tuple
-from .config import get_db_connection, get_db_cursor, Scope, ResourceType, get_definitions_path, ensure_directory_exists
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+from .config import get_db_connection, release_db_connection, get_db_cursor, Scope, ResourceType, get_definitions_path, ensure_directory_exists, load_json_file, dump_json_file, write_file_if_changed
 from .tool_manager import ToolManager
 
+# Conflict clause shared by the single-row and scope-wide agent upserts
+AGENT_UPSERT_CONFLICT = """
+            ON CONFLICT (id) DO UPDATE SET
+                name = EXCLUDED.name,
+                description = EXCLUDED.description,
+                system_prompt = EXCLUDED.system_prompt,
+                llm_model_id = EXCLUDED.llm_model_id,
+                updated_at = NOW()
+"""
+
 class AgentManager:
     """Manages agent operations including creation, syncing, and database operations."""
     
-    def __init__(self):
-        self.conn = None
+    # CCRM only has system_agent table; COMMON_BACKGROUND agents are tracked in local files only
+    TABLE_NAMES = {
+        Scope.SYSTEM: "system_agent",
+        Scope.COMMON_BACKGROUND: "system_agent",
+    }
+    
+    # Per-scope upsert used by sync_agent_to_db, built once instead of formatted on every call
+    UPSERT_SQL = {
+        scope: f"""
+            INSERT INTO {table_name}
+            (id, name, description, system_prompt, llm_model_id, is_default)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """ + AGENT_UPSERT_CONFLICT
+        for scope, table_name in TABLE_NAMES.items()
+    }
+    
+    # Scope-wide upsert used by sync_all_agents: one statement over parallel column arrays
+    UPSERT_MANY_SQL = {
+        scope: f"""
+            INSERT INTO {table_name}
+            (id, name, description, system_prompt, llm_model_id, is_default)
+            SELECT * FROM unnest(%s::uuid[], %s::text[], %s::text[], %s::text[], %s::text[], %s::bool[])
+        """ + AGENT_UPSERT_CONFLICT
+        for scope, table_name in TABLE_NAMES.items()
+    }
+    
+    def __init__(self, conn=None):
+        # A connection passed in is borrowed: the owner controls its transaction and lifetime
+        self.conn = conn
         self.cursor = None
+        self._owns_conn = conn is None
+        self._tool_manager = None
     
     def __enter__(self):
         """Context manager entry."""
-        self.conn = get_db_connection()
+        if self._owns_conn:
+            self.conn = get_db_connection()
         self.cursor = get_db_cursor(self.conn)
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Context manager exit."""
+        if self._tool_manager:
+            self._tool_manager.__exit__(exc_type, exc_val, exc_tb)
+            self._tool_manager = None
         if self.cursor:
             self.cursor.close()
-        if self.conn:
-            self.conn.close()
+        if self.conn and self._owns_conn:
+            release_db_connection(self.conn)
+
+    def _commit(self):
+        """Commit, unless the connection is borrowed from a caller managing the transaction."""
+        if self._owns_conn:
+            self.conn.commit()
+
+    @property
+    def tool_manager(self) -> ToolManager:
+        """ToolManager on this manager's connection, so tool changes share the agent's transaction."""
+        if self._tool_manager is None:
+            self._tool_manager = ToolManager(self.conn).__enter__()
+        return self._tool_manager
 
     def _get_table_name(self, scope: Scope) -> str:
         """Get the correct table name based on the scope."""
-        # CCRM only has system_agent table (no schema prefix, no common_background variant)
-        if scope == Scope.SYSTEM:
-            return "system_agent"
-        elif scope == Scope.COMMON_BACKGROUND:
-            # For now, CCRM doesn't have a separate common_background_agent table
-            # We'll use system_agent and track scope in the local files only
-            return "system_agent"
-        else:
+        try:
+            return self.TABLE_NAMES[scope]
+        except KeyError:
             raise ValueError(f"Invalid scope: {scope}")
     
     def create_agent(self, name: str, scope: Scope, description: str = "", system_prompt: str = "") -> str:
@@ -65,7 +115,7 @@ class AgentManager:
         # Create local directory and files
         self._create_agent_files(name, agent_id, scope, description, system_prompt)
         
-        self.conn.commit()
+        self._commit()
         return agent_id
     
     def _create_agent_files(self, name: str, agent_id: str, scope: Scope, description: str, system_prompt: str):
@@ -76,8 +126,7 @@ class AgentManager:
         
         # Create systemPrompt.md
         prompt_content = system_prompt or f"You are {name}, a helpful AI assistant."
-        with open(os.path.join(agent_dir, 'systemPrompt.md'), 'w') as f:
-            f.write(prompt_content)
+        write_file_if_changed(os.path.join(agent_dir, 'systemPrompt.md'), prompt_content.encode('utf-8'))
         
         # Create jsonSchema.json
         schema = {
@@ -88,89 +137,102 @@ class AgentManager:
             "tools": []
         }
         
-        with open(os.path.join(agent_dir, 'jsonSchema.json'), 'w') as f:
-            json.dump(schema, f, indent=2)
+        dump_json_file(os.path.join(agent_dir, 'jsonSchema.json'), schema)
     
-    def sync_agent_to_db(self, name: str, scope: Scope) -> str:
-        """Sync a single agent from local files to database."""
-        agent_dir = os.path.join(get_definitions_path(scope, ResourceType.AGENT), name)
-        table_name = self._get_table_name(scope)
-        
+    @staticmethod
+    def _read_agent_files(agent_dir: str) -> Tuple[str, Dict]:
+        """Read an agent's systemPrompt.md and jsonSchema.json."""
         if not os.path.exists(agent_dir):
             raise FileNotFoundError(f"Agent directory not found: {agent_dir}")
         
-        # Read files
         with open(os.path.join(agent_dir, 'systemPrompt.md'), 'r') as f:
             system_prompt = f.read().strip()
         
-        with open(os.path.join(agent_dir, 'jsonSchema.json'), 'r') as f:
-            schema = json.load(f)
+        schema = load_json_file(os.path.join(agent_dir, 'jsonSchema.json'))
         
-        agent_id = schema.get('agentId', str(uuid.uuid4()))
-        
-        # Upsert agent
-        self.cursor.execute(f"""
-            INSERT INTO {table_name}
-            (id, name, description, system_prompt, llm_model_id, is_default)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            ON CONFLICT (id) DO UPDATE SET
-                name = EXCLUDED.name,
-                description = EXCLUDED.description,
-                system_prompt = EXCLUDED.system_prompt,
-                llm_model_id = EXCLUDED.llm_model_id,
-                updated_at = NOW()
-        """, (
-            agent_id,
+        return system_prompt, schema
+    
+    @staticmethod
+    def _agent_row(name: str, agent_files: Tuple[str, Dict]) -> Tuple:
+        """Build the (id, name, description, system_prompt, llm_model_id, is_default) row for an agent."""
+        system_prompt, schema = agent_files
+        return (
+            schema['agentId'] if 'agentId' in schema else str(uuid.uuid4()),
             name,
             schema.get('description', ''),
             system_prompt,
             'claude-sonnet-4-20250514',
             False
-        ))
+        )
+    
+    def _sync_agent_tools(self, agent_id: str, schema: Dict, scope: Scope,
+                          current_tool_ids: Optional[Set[str]] = None):
+        """Sync the tools listed in an agent's schema, if it lists any."""
+        if 'tools' in schema:
+            sync_results = self.tool_manager.sync_agent_tools(agent_id, schema['tools'], scope, current_tool_ids)
+            print(f"Tool sync results: {sync_results}")
+    
+    def sync_agent_to_db(self, name: str, scope: Scope, agent_files: Optional[Tuple[str, Dict]] = None,
+                         commit: bool = True, current_tool_ids: Optional[Set[str]] = None) -> str:
+        """Sync a single agent from local files to database."""
+        if scope not in self.UPSERT_SQL:
+            raise ValueError(f"Invalid scope: {scope}")
         
-        # Commit the agent creation/update before handling tools
-        self.conn.commit()
+        # Read files unless the caller already loaded them
+        if agent_files is None:
+            agent_files = self._read_agent_files(os.path.join(get_definitions_path(scope, ResourceType.AGENT), name))
+        agent_row = self._agent_row(name, agent_files)
+        agent_id = agent_row[0]
         
-        # Handle tools if present
-        if 'tools' in schema:
-            with ToolManager() as tm:
-                sync_results = tm.sync_agent_tools(agent_id, schema['tools'], scope)
-                print(f"Tool sync results: {sync_results}")
+        # Upsert agent
+        self.cursor.execute(self.UPSERT_SQL[scope], agent_row)
+        
+        self._sync_agent_tools(agent_id, agent_files[1], scope, current_tool_ids)
+        
+        if commit:
+            self._commit()
         
         return agent_id
     
     def sync_agent_from_db(self, name: str, scope: Scope) -> str:
         """Sync a single agent from database to local files."""
         table_name = self._get_table_name(scope)
-        # Get agent from database
-        self.cursor.execute(f"""
-            SELECT * FROM {table_name} WHERE name = %s
-        """, (name,))
+        # Get agent from database (plain tuple cursor, only the columns the files need)
+        with self.conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT id, description, system_prompt FROM {table_name} WHERE name = %s
+            """, (name,))
+            agent = cur.fetchone()
         
-        agent = self.cursor.fetchone()
         if not agent:
             raise ValueError(f"Agent {name} not found in database with scope {scope.value}")
+        agent_id, description, system_prompt = agent
         
         # Create local files
         self._create_agent_files(
             name,
-            agent['id'],
+            agent_id,
             scope,
-            agent['description'] or '',
-            agent['system_prompt']
+            description or '',
+            system_prompt
         )
         
-        return agent['id']
+        return agent_id
     
     def list_agents(self, scope: Optional[Scope] = None) -> List[Dict]:
         """List all agents, optionally filtered by scope."""
         # CCRM only has system_agent table, so we query it directly
         # Scope is tracked in local file metadata, not in database
         table_name = self._get_table_name(Scope.SYSTEM)
-        query = f"SELECT *, 'SYSTEM' as scope FROM {table_name} ORDER BY name"
-        self.cursor.execute(query)
-
-        return [dict(row) for row in self.cursor.fetchall()]
+        query = f"""
+            SELECT id, name, description, system_prompt, llm_model_id, is_default, 'SYSTEM' as scope
+            FROM {table_name} ORDER BY name
+        """
+        # Plain tuple cursor: build each dict once from the column names instead of per-row RealDictRow
+        with self.conn.cursor() as cur:
+            cur.execute(query)
+            columns = [column.name for column in cur.description]
+            return [dict(zip(columns, row)) for row in cur.fetchall()]
     
     def delete_agent(self, name: str, scope: Scope) -> bool:
         """Delete an agent from both database and local files."""
@@ -189,7 +251,7 @@ class AgentManager:
             import shutil
             shutil.rmtree(agent_dir)
         
-        self.conn.commit()
+        self._commit()
         return True
     
     def sync_all_agents(self, scope: Optional[Scope] = None) -> Dict[str, List[str]]:
@@ -205,13 +267,65 @@ class AgentManager:
             if not os.path.exists(definitions_path):
                 continue
             
-            for agent_name in os.listdir(definitions_path):
-                agent_dir = os.path.join(definitions_path, agent_name)
-                if os.path.isdir(agent_dir):
-                    try:
-                        agent_id = self.sync_agent_to_db(agent_name, current_scope)
-                        results["success"].append(f"{current_scope.value}:{agent_name} (ID: {agent_id})")
-                    except Exception as e:
-                        results["errors"].append(f"{current_scope.value}:{agent_name} - {str(e)}")
+            with os.scandir(definitions_path) as entries:
+                agent_names = [entry.name for entry in entries if entry.is_dir()]
+            
+            # Read files on a thread pool, then drive the DB writes from this thread
+            def read_files(agent_name):
+                try:
+                    return self._read_agent_files(os.path.join(definitions_path, agent_name))
+                except Exception as e:
+                    return e
+            
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                prepared = list(executor.map(read_files, agent_names))
+            
+            # Build every readable agent's row up front
+            agents = []
+            for agent_name, agent_files in zip(agent_names, prepared):
+                if isinstance(agent_files, Exception):
+                    results["errors"].append(f"{current_scope.value}:{agent_name} - {str(agent_files)}")
+                    continue
+                agent_row = self._agent_row(agent_name, agent_files)
+                try:
+                    uuid.UUID(agent_row[0])
+                except (AttributeError, TypeError, ValueError):
+                    # Keep a bad agentId from failing the whole scope-wide statement
+                    results["errors"].append(f"{current_scope.value}:{agent_name} - Invalid agentId: {agent_row[0]}")
+                    continue
+                agents.append((agent_name, agent_row, agent_files[1]))
+            
+            if not agents:
+                continue
+            
+            # Upsert all agents in the scope in one statement; unnest can't touch an id twice, so the
+            # last directory with a given agentId wins, as it did when agents were upserted one by one
+            unique_rows = {agent_row[0]: agent_row for _, agent_row, _ in agents}
+            self.cursor.execute("SAVEPOINT sync_agents")
+            try:
+                self.cursor.execute(self.UPSERT_MANY_SQL[current_scope],
+                                    [list(column) for column in zip(*unique_rows.values())])
+                self.cursor.execute("RELEASE SAVEPOINT sync_agents")
+            except Exception as e:
+                self.cursor.execute("ROLLBACK TO SAVEPOINT sync_agents")
+                results["errors"].extend(f"{current_scope.value}:{agent_name} - {str(e)}" for agent_name, _, _ in agents)
+                continue
+            
+            # Fetch existing tool associations for every agent in the scope with one query
+            tool_ids_by_agent = self.tool_manager.get_agent_tool_ids(list(unique_rows), current_scope)
+            
+            # One transaction per scope; a savepoint per agent keeps one failing tool sync from aborting the rest
+            for agent_name, agent_row, schema in agents:
+                agent_id = agent_row[0]
+                self.cursor.execute("SAVEPOINT sync_agent")
+                try:
+                    self._sync_agent_tools(agent_id, schema, current_scope, tool_ids_by_agent.get(agent_id, set()))
+                    self.cursor.execute("RELEASE SAVEPOINT sync_agent")
+                    results["success"].append(f"{current_scope.value}:{agent_name} (ID: {agent_id})")
+                except Exception as e:
+                    self.cursor.execute("ROLLBACK TO SAVEPOINT sync_agent")
+                    results["errors"].append(f"{current_scope.value}:{agent_name} - {str(e)}")
+            
+            self._commit()
         
         return results
\ No newline at end of file
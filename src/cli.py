@@ -5,116 +5,107 @@ Provides a unified way to manage agents and workflows with dual scope support.
 
 import argparse
 import sys
-from typing import Optional
-from .config import Scope, ResourceType, validate_scope, validate_resource_type
-from .agent_manager import AgentManager
-from .workflow_manager import WorkflowManager
-from .tool_manager import ToolManager
-from .error_handler import error_handler
+from .config import Scope, validate_scope, DBSession
+from .error_handler import error_handler, logged_operation
 
+# Shown as the --scope metavar; the values themselves are checked by _parse_scope
+SCOPE_METAVAR = "{" + ",".join(s.value for s in Scope) + "}"
+
+# Shared by every --direction argument instead of rebuilding the list per parser
+DIRECTION_CHOICES = ('to', 'from')
+
+# Status prefixes shared by the command output
+_OK = "✅ "
+_FAIL = "❌ "
+_EMPTY = "📭 "
+_LIST = "📋 "
+
+@logged_operation("create_agent", lambda args: {"name": args.name, "scope": args.scope.value})
 def create_agent_command(args):
     """Create a new agent."""
-    try:
-        error_handler.log_operation_start("create_agent", {"name": args.name, "scope": args.scope})
-        
-        scope = validate_scope(args.scope)
-        
-        with AgentManager() as am:
-            agent_id = am.create_agent(
-                name=args.name,
-                scope=scope,
-                description=args.description or "",
-                system_prompt=args.system_prompt or ""
-            )
-            print(f"✅ Created agent '{args.name}' with ID: {agent_id}")
-            print(f"📁 Files created in: definitions/{scope.value}/Agents/{args.name}/")
-            
-            error_handler.log_operation_success("create_agent", {"agent_id": agent_id})
-            
-    except Exception as e:
-        error_handler.log_operation_failure("create_agent", e)
-        error_handler.handle_error(e, {
-            "operation": "create_agent",
-            "agent_name": args.name,
-            "scope": args.scope
-        })
+    from .agent_manager import AgentManager
+    scope = args.scope
+    
+    with AgentManager() as am:
+        agent_id = am.create_agent(
+            name=args.name,
+            scope=scope,
+            description=args.description or "",
+            system_prompt=args.system_prompt or ""
+        )
+        print(_OK + f"Created agent '{args.name}' with ID: {agent_id}")
+        print(f"📁 Files created in: definitions/{scope.value}/Agents/{args.name}/")
+    
+    return {"agent_id": agent_id}
 
+@logged_operation("sync_agent", lambda args: {"name": ", ".join(args.name), "scope": args.scope.value, "direction": args.direction})
 def sync_agent_command(args):
-    """Sync an agent to/from database."""
-    try:
-        error_handler.log_operation_start("sync_agent", {
-            "name": args.name, 
-            "scope": args.scope, 
-            "direction": args.direction
-        })
-        
-        scope = validate_scope(args.scope)
-        
-        with AgentManager() as am:
-            if args.direction == "to":
-                agent_id = am.sync_agent_to_db(args.name, scope)
-                print(f"✅ Synced agent '{args.name}' to database (ID: {agent_id})")
-            else:
-                agent_id = am.sync_agent_from_db(args.name, scope)
-                print(f"✅ Synced agent '{args.name}' from database (ID: {agent_id})")
-            
-            error_handler.log_operation_success("sync_agent", {"agent_id": agent_id})
-            
-    except Exception as e:
-        error_handler.log_operation_failure("sync_agent", e)
-        error_handler.handle_error(e, {
-            "operation": "sync_agent",
-            "agent_name": args.name,
-            "scope": args.scope,
-            "direction": args.direction
-        })
+    """Sync one or more agents to/from database."""
+    from .agent_manager import AgentManager
+    scope = args.scope
+    # argparse already restricted --direction to DIRECTION_CHOICES
+    sync = AgentManager.sync_agent_to_db if args.direction == "to" else AgentManager.sync_agent_from_db
+    
+    # Several names share one connection instead of paying a connect per invocation
+    agent_ids = []
+    with AgentManager() as am:
+        for name in args.name:
+            agent_id = sync(am, name, scope)
+            agent_ids.append(agent_id)
+            print(_OK + f"Synced agent '{name}' {args.direction} database (ID: {agent_id})")
+    
+    return {"agent_ids": agent_ids}
 
 def list_agents_command(args):
     """List all agents."""
-    scope = validate_scope(args.scope) if args.scope else None
+    from .agent_manager import AgentManager
+    scope = args.scope
     
     with AgentManager() as am:
         agents = am.list_agents(scope)
         
         if not agents:
             scope_text = f" in scope {scope.value}" if scope else ""
-            print(f"📭 No agents found{scope_text}")
+            print(_EMPTY + f"No agents found{scope_text}")
             return
         
-        print(f"📋 Agents{(' in scope ' + scope.value) if scope else ''}:")
-        for agent in agents:
-            print(f"  • {agent['name']} (ID: {agent['id']}, Scope: {agent['scope']})")
+        lines = [_LIST + f"Agents{(' in scope ' + scope.value) if scope else ''}:"]
+        lines.extend(f"  • {agent['name']} (ID: {agent['id']}, Scope: {agent['scope']})" for agent in agents)
+        sys.stdout.write("\n".join(lines) + "\n")
 
 def delete_agent_command(args):
     """Delete an agent."""
-    scope = validate_scope(args.scope)
+    from .agent_manager import AgentManager
+    scope = args.scope
     
     with AgentManager() as am:
         if am.delete_agent(args.name, scope):
-            print(f"✅ Deleted agent '{args.name}' from scope {scope.value}")
+            print(_OK + f"Deleted agent '{args.name}' from scope {scope.value}")
         else:
-            print(f"❌ Agent '{args.name}' not found in scope {scope.value}")
+            print(_FAIL + f"Agent '{args.name}' not found in scope {scope.value}")
 
 def sync_all_agents_command(args):
     """Sync all agents from local files to database."""
-    scope = validate_scope(args.scope) if args.scope else None
+    from .agent_manager import AgentManager
+    scope = args.scope
     
     with AgentManager() as am:
         results = am.sync_all_agents(scope)
         
         if results["success"]:
-            print("✅ Successfully synced:")
+            print(_OK + "Successfully synced:")
             for success in results["success"]:
                 print(f"  • {success}")
         
         if results["errors"]:
-            print("❌ Errors:")
+            print(_FAIL + "Errors:")
             for error in results["errors"]:
                 print(f"  • {error}")
 
 def create_workflow_command(args):
     """Create a new workflow."""
-    scope = validate_scope(args.scope)
+    from .workflow_manager import WorkflowManager
+    scope = args.scope
     
     with WorkflowManager() as wm:
         workflow_id = wm.create_workflow(
@@ -123,84 +114,89 @@ def create_workflow_command(args):
             scope=scope,
             description=args.description or ""
         )
-        print(f"✅ Created workflow '{args.name}' with ID: {workflow_id}")
+        print(_OK + f"Created workflow '{args.name}' with ID: {workflow_id}")
         print(f"📁 Files created in: definitions/{scope.value}/AgenticWorkflows/{workflow_id}/")
 
 def sync_workflow_command(args):
-    """Sync a workflow to/from database."""
-    scope = validate_scope(args.scope)
+    """Sync one or more workflows to/from database."""
+    from .workflow_manager import WorkflowManager
+    scope = args.scope
+    # argparse already restricted --direction to DIRECTION_CHOICES
+    sync = WorkflowManager.sync_workflow_to_db if args.direction == "to" else WorkflowManager.sync_workflow_from_db
     
     with WorkflowManager() as wm:
-        if args.direction == "to":
-            workflow_id = wm.sync_workflow_to_db(args.id, scope)
-            print(f"✅ Synced workflow '{args.id}' to database")
-        else:
-            workflow_id = wm.sync_workflow_from_db(args.id, scope)
-            print(f"✅ Synced workflow '{args.id}' from database")
+        for workflow_id in args.id:
+            sync(wm, workflow_id, scope)
+            print(_OK + f"Synced workflow '{workflow_id}' {args.direction} database")
 
 def list_workflows_command(args):
     """List all workflows."""
-    scope = validate_scope(args.scope) if args.scope else None
+    from .workflow_manager import WorkflowManager
+    scope = args.scope
     
     with WorkflowManager() as wm:
         workflows = wm.list_workflows(scope)
         
         if not workflows:
             scope_text = f" in scope {scope.value}" if scope else ""
-            print(f"📭 No workflows found{scope_text}")
+            print(_EMPTY + f"No workflows found{scope_text}")
             return
         
-        print(f"📋 Workflows{(' in scope ' + scope.value) if scope else ''}:")
-        for workflow in workflows:
-            print(f"  • {workflow['name']} (ID: {workflow['id']}, Scope: {workflow['scope']})")
+        lines = [_LIST + f"Workflows{(' in scope ' + scope.value) if scope else ''}:"]
+        lines.extend(f"  • {workflow['name']} (ID: {workflow['id']}, Scope: {workflow['scope']})" for workflow in workflows)
+        sys.stdout.write("\n".join(lines) + "\n")
 
 def delete_workflow_command(args):
     """Delete a workflow."""
-    scope = validate_scope(args.scope)
+    from .workflow_manager import WorkflowManager
+    scope = args.scope
     
     with WorkflowManager() as wm:
         if wm.delete_workflow(args.id, scope):
-            print(f"✅ Deleted workflow '{args.id}' from scope {scope.value}")
+            print(_OK + f"Deleted workflow '{args.id}' from scope {scope.value}")
         else:
-            print(f"❌ Workflow '{args.id}' not found in scope {scope.value}")
+            print(_FAIL + f"Workflow '{args.id}' not found in scope {scope.value}")
 
 def sync_all_workflows_command(args):
     """Sync all workflows from local files to database."""
-    scope = validate_scope(args.scope) if args.scope else None
+    from .workflow_manager import WorkflowManager
+    scope = args.scope
     
     with WorkflowManager() as wm:
-        results = wm.sync_all_workflows(scope)
+        results = wm.sync_all_workflows(scope, bulk=args.bulk, changed_only=args.changed_only)
         
         if results["success"]:
-            print("✅ Successfully synced:")
+            print(_OK + "Successfully synced:")
             for success in results["success"]:
                 print(f"  • {success}")
         
         if results["errors"]:
-            print("❌ Errors:")
+            print(_FAIL + "Errors:")
             for error in results["errors"]:
                 print(f"  • {error}")
 
 def list_tools_command(args):
     """List all tools."""
+    from .tool_manager import ToolManager
     with ToolManager() as tm:
         tools = tm.list_tools()
         
         if not tools:
-            print("📭 No tools found")
+            print(_EMPTY + "No tools found")
             return
         
-        print(f"📋 Tools ({len(tools)} total):")
-        for tool in tools:
-            print(f"  • {tool['toolName']} (ID: {tool['id']}, Type: {tool['toolType']})")
+        lines = [_LIST + f"Tools ({len(tools)} total):"]
+        lines.extend(f"  • {tool['toolName']} (ID: {tool['id']}, Type: {tool['toolType']})" for tool in tools)
+        sys.stdout.write("\n".join(lines) + "\n")
 
 def get_tool_command(args):
     """Get a specific tool."""
+    from .tool_manager import ToolManager
     with ToolManager() as tm:
         tool = tm.get_tool(args.id)
         
         if not tool:
-            print(f"❌ Tool {args.id} not found")
+            print(_FAIL + f"Tool {args.id} not found")
             return
         
         print(f"🔧 Tool: {tool['toolName']}")
@@ -212,6 +208,7 @@ def get_tool_command(args):
 
 def create_tool_command(args):
     """Create a new tool."""
+    from .tool_manager import ToolManager
     with ToolManager() as tm:
         tool_id = tm.create_tool(
             tool_id=args.id,
@@ -220,137 +217,205 @@ def create_tool_command(args):
             tool_type=args.type,
             internal_api_path=args.api_path
         )
-        print(f"✅ Created tool '{args.name}' with ID: {tool_id}")
+        print(_OK + f"Created tool '{args.name}' with ID: {tool_id}")
 
 def delete_tool_command(args):
     """Delete a tool."""
+    from .tool_manager import ToolManager
     with ToolManager() as tm:
         try:
             if tm.delete_tool(args.id, force=args.force):
-                print(f"✅ Deleted tool {args.id}")
+                print(_OK + f"Deleted tool {args.id}")
             else:
-                print(f"❌ Tool {args.id} not found")
+                print(_FAIL + f"Tool {args.id} not found")
         except ValueError as e:
-            print(f"❌ Error: {e}")
+            print(_FAIL + f"Error: {e}")
 
 def orphaned_tools_command(args):
     """Find orphaned tools."""
+    from .tool_manager import ToolManager
     with ToolManager() as tm:
         orphaned_tools = tm.find_orphaned_tools()
         
         if not orphaned_tools:
-            print("✅ No orphaned tools found")
+            print(_OK + "No orphaned tools found")
             return
         
-        print(f"🔍 Found {len(orphaned_tools)} orphaned tools:")
-        for tool in orphaned_tools:
-            print(f"  • {tool['toolName']} (ID: {tool['id']})")
+        lines = [f"🔍 Found {len(orphaned_tools)} orphaned tools:"]
+        lines.extend(f"  • {tool['toolName']} (ID: {tool['id']})" for tool in orphaned_tools)
+        sys.stdout.write("\n".join(lines) + "\n")
 
 def cleanup_tools_command(args):
     """Cleanup orphaned tools."""
+    from .tool_manager import ToolManager
     with ToolManager() as tm:
         deleted_count = tm.cleanup_orphaned_tools(force=args.force)
         
         if deleted_count > 0:
-            print(f"✅ Cleaned up {deleted_count} orphaned tools")
+            print(_OK + f"Cleaned up {deleted_count} orphaned tools")
         else:
-            print("✅ No orphaned tools to clean up")
+            print(_OK + "No orphaned tools to clean up")
 
 def validate_workflow_command(args):
     """Validate a workflow."""
-    scope = validate_scope(args.scope)
+    from .workflow_manager import WorkflowManager
+    scope = args.scope
     with WorkflowManager() as wm:
         result = wm.validate_workflow(args.id, scope)
         
         if result["valid"]:
-            print(f"✅ Workflow '{args.id}' is valid")
+            print(_OK + f"Workflow '{args.id}' is valid")
             if result["warnings"]:
                 print("\n⚠️  Warnings:")
                 for warning in result["warnings"]:
                     print(f"   • {warning}")
         else:
-            print(f"❌ Workflow '{args.id}' has errors:")
+            print(_FAIL + f"Workflow '{args.id}' has errors:")
             for error in result["errors"]:
                 print(f"   • {error}")
 
 def get_workflow_agents_command(args):
     """Get agents referenced by a workflow."""
-    scope = validate_scope(args.scope)
+    from .workflow_manager import WorkflowManager
+    scope = args.scope
     with WorkflowManager() as wm:
         agents = wm.get_workflow_agents(args.id, scope)
         
         if not agents:
-            print(f"📭 No agents referenced by workflow '{args.id}'")
+            print(_EMPTY + f"No agents referenced by workflow '{args.id}'")
             return
         
-        print(f"📋 Agents referenced by workflow '{args.id}':")
+        print(_LIST + f"Agents referenced by workflow '{args.id}':")
         for agent in agents:
             print(f"  • {agent['name']} (ID: {agent['id']}, Scope: {agent['scope']})")
 
 def get_agent_workflows_command(args):
     """Get workflows that reference an agent."""
+    from .workflow_manager import WorkflowManager
     with WorkflowManager() as wm:
         workflows = wm.get_agent_workflows(args.agent_id)
         
         if not workflows:
-            print(f"📭 No workflows reference agent '{args.agent_id}'")
+            print(_EMPTY + f"No workflows reference agent '{args.agent_id}'")
             return
         
-        print(f"📋 Workflows that reference agent '{args.agent_id}':")
+        print(_LIST + f"Workflows that reference agent '{args.agent_id}':")
         for workflow in workflows:
             print(f"  • {workflow['name']} (ID: {workflow['id']}, Scope: {workflow['scope']})")
 
+@logged_operation("sync_all", lambda args: {"scope": args.scope.value if args.scope else None})
 def sync_all_command(args):
     """Sync all agents and workflows."""
-    try:
-        error_handler.log_operation_start("sync_all", {"scope": args.scope})
-        
-        scope = validate_scope(args.scope) if args.scope else None
+    from concurrent.futures import ThreadPoolExecutor
+    from .agent_manager import AgentManager
+    from .workflow_manager import WorkflowManager
+    scope = args.scope
+    
+    # One connection and one transaction for both syncs. Workflow nodes reference agents, so the
+    # database work stays ordered; the workflow files are read on a thread while agents sync.
+    with DBSession() as conn, AgentManager(conn) as am, WorkflowManager(conn) as wm, \
+            ThreadPoolExecutor(max_workers=1) as executor:
+        workflow_files = executor.submit(wm.read_all_workflow_files, scope)
         
         print("🔄 Syncing all agents...")
-        with AgentManager() as am:
-            agent_results = am.sync_all_agents(scope)
+        agent_results = am.sync_all_agents(scope)
         
         print("🔄 Syncing all workflows...")
-        with WorkflowManager() as wm:
-            workflow_results = wm.sync_all_workflows(scope)
-        
-        # Report results
-        total_success = len(agent_results["success"]) + len(workflow_results["success"])
-        total_errors = len(agent_results["errors"]) + len(workflow_results["errors"])
-        
-        print(f"\n📊 Sync Summary:")
-        print(f"  ✅ Successfully synced: {total_success} resources")
-        print(f"  ❌ Errors: {total_errors} resources")
-        
-        if agent_results["errors"] or workflow_results["errors"]:
-            print("\n❌ Detailed errors:")
-            for error in agent_results["errors"]:
-                print(f"  • Agent: {error}")
-            for error in workflow_results["errors"]:
-                print(f"  • Workflow: {error}")
-        
-        error_handler.log_operation_success("sync_all", {
-            "total_success": total_success,
-            "total_errors": total_errors
-        })
-        
-    except Exception as e:
-        error_handler.log_operation_failure("sync_all", e)
-        error_handler.handle_error(e, {
-            "operation": "sync_all",
-            "scope": args.scope
-        })
-
-def main():
-    """Main CLI entry point."""
-    if not error_handler.validate_environment():
-        sys.exit(1)
+        workflow_results = wm.sync_all_workflows(scope, workflow_files.result())
     
-    parser = argparse.ArgumentParser(
-        description="cc Agents Management System",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
+    # Report results
+    total_success = len(agent_results["success"]) + len(workflow_results["success"])
+    total_errors = len(agent_results["errors"]) + len(workflow_results["errors"])
+    
+    print(f"\n📊 Sync Summary:")
+    print(f"  ✅ Successfully synced: {total_success} resources")
+    print(f"  ❌ Errors: {total_errors} resources")
+    
+    if agent_results["errors"] or workflow_results["errors"]:
+        lines = ["\n❌ Detailed errors:"]
+        lines.extend(f"  • Agent: {error}" for error in agent_results["errors"])
+        lines.extend(f"  • Workflow: {error}" for error in workflow_results["errors"])
+        sys.stdout.write("\n".join(lines) + "\n")
+    
+    return {"total_success": total_success, "total_errors": total_errors}
+
+def _parse_scope(value: str) -> Scope:
+    """argparse type for --scope: converts once at parse time, so commands receive a Scope."""
+    try:
+        return validate_scope(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def _add_scope_argument(parser, required=False, help_text='Filter by scope'):
+    """Add the --scope option shared by most subcommands."""
+    parser.add_argument('--scope', required=required, type=_parse_scope, metavar=SCOPE_METAVAR, help=help_text)
+
+def _build_scope_filter_parser(parser):
+    """Arguments of the commands that only take an optional --scope filter."""
+    _add_scope_argument(parser)
+
+def _build_agent_create_parser(parser):
+    parser.add_argument('--name', required=True, help='Agent name')
+    _add_scope_argument(parser, True, 'Agent scope')
+    parser.add_argument('--description', help='Agent description')
+    parser.add_argument('--system-prompt', help='System prompt')
+
+def _build_agent_sync_parser(parser):
+    parser.add_argument('--name', required=True, action='extend', nargs='+', help='Agent name(s)')
+    _add_scope_argument(parser, True, 'Agent scope')
+    parser.add_argument('--direction', choices=DIRECTION_CHOICES, default='to', help='Sync direction')
+
+def _build_agent_delete_parser(parser):
+    parser.add_argument('--name', required=True, help='Agent name')
+    _add_scope_argument(parser, True, 'Agent scope')
+
+def _build_workflow_create_parser(parser):
+    parser.add_argument('--id', required=True, help='Workflow ID')
+    parser.add_argument('--name', required=True, help='Workflow name')
+    _add_scope_argument(parser, True, 'Workflow scope')
+    parser.add_argument('--description', help='Workflow description')
+
+def _build_workflow_sync_parser(parser):
+    parser.add_argument('--id', required=True, action='extend', nargs='+', help='Workflow ID(s)')
+    _add_scope_argument(parser, True, 'Workflow scope')
+    parser.add_argument('--direction', choices=DIRECTION_CHOICES, default='to', help='Sync direction')
+
+def _build_workflow_sync_all_parser(parser):
+    _add_scope_argument(parser)
+    parser.add_argument('--bulk', action='store_true',
+                        help='Load each scope with COPY; one failing workflow fails its whole scope')
+    parser.add_argument('--changed-only', action='store_true',
+                        help='Skip workflows whose workflow.json is unchanged since the last --changed-only sync to this database')
+
+def _build_workflow_id_parser(parser):
+    """Arguments of the workflow commands addressed by --id and --scope."""
+    parser.add_argument('--id', required=True, help='Workflow ID')
+    _add_scope_argument(parser, True, 'Workflow scope')
+
+def _build_workflow_referenced_by_parser(parser):
+    parser.add_argument('--agent-id', required=True, help='Agent ID')
+
+def _build_no_arguments_parser(parser):
+    """Commands without arguments of their own."""
+
+def _build_tool_get_parser(parser):
+    parser.add_argument('--id', required=True, help='Tool ID')
+
+def _build_tool_create_parser(parser):
+    parser.add_argument('--id', required=True, help='Tool ID')
+    parser.add_argument('--name', required=True, help='Tool name')
+    parser.add_argument('--description', help='Tool description')
+    parser.add_argument('--type', default='custom', help='Tool type')
+    parser.add_argument('--api-path', help='Internal API path')
+
+def _build_tool_delete_parser(parser):
+    parser.add_argument('--id', required=True, help='Tool ID')
+    parser.add_argument('--force', action='store_true', help='Force delete even if associated with agents')
+
+def _build_tool_cleanup_parser(parser):
+    parser.add_argument('--force', action='store_true', help='Force cleanup')
+
+EPILOG = """
 Examples:
   # Create a new system agent
   python -m src.cli agent create --name "Research Agent" --scope SYSTEM --description "An agent for research tasks"
@@ -371,126 +436,119 @@ Troubleshooting:
   # Test system configuration
   python -m src.test_system
         """
-    )
-    
-    subparsers = parser.add_subparsers(dest='command', help='Available commands', required=True)
-    
-    # Agent commands
-    agent_parser = subparsers.add_parser('agent', help='Agent management')
-    agent_subparsers = agent_parser.add_subparsers(dest='agent_command', help='Agent commands', required=True)
-    
-    create_agent_parser = agent_subparsers.add_parser('create', help='Create a new agent')
-    create_agent_parser.add_argument('--name', required=True, help='Agent name')
-    create_agent_parser.add_argument('--scope', required=True, choices=[s.value for s in Scope], help='Agent scope')
-    create_agent_parser.add_argument('--description', help='Agent description')
-    create_agent_parser.add_argument('--system-prompt', help='System prompt')
-    create_agent_parser.set_defaults(func=create_agent_command)
-    
-    sync_agent_parser = agent_subparsers.add_parser('sync', help='Sync an agent')
-    sync_agent_parser.add_argument('--name', required=True, help='Agent name')
-    sync_agent_parser.add_argument('--scope', required=True, choices=[s.value for s in Scope], help='Agent scope')
-    sync_agent_parser.add_argument('--direction', choices=['to', 'from'], default='to', help='Sync direction')
-    sync_agent_parser.set_defaults(func=sync_agent_command)
-    
-    list_agents_parser = agent_subparsers.add_parser('list', help='List all agents')
-    list_agents_parser.add_argument('--scope', choices=[s.value for s in Scope], help='Filter by scope')
-    list_agents_parser.set_defaults(func=list_agents_command)
-    
-    delete_agent_parser = agent_subparsers.add_parser('delete', help='Delete an agent')
-    delete_agent_parser.add_argument('--name', required=True, help='Agent name')
-    delete_agent_parser.add_argument('--scope', required=True, choices=[s.value for s in Scope], help='Agent scope')
-    delete_agent_parser.set_defaults(func=delete_agent_command)
-    
-    sync_all_agents_parser = agent_subparsers.add_parser('sync-all', help='Sync all agents')
-    sync_all_agents_parser.add_argument('--scope', choices=[s.value for s in Scope], help='Filter by scope')
-    sync_all_agents_parser.set_defaults(func=sync_all_agents_command)
-    
-    # Workflow commands
-    workflow_parser = subparsers.add_parser('workflow', help='Workflow management')
-    workflow_subparsers = workflow_parser.add_subparsers(dest='workflow_command', help='Workflow commands', required=True)
-    
-    create_workflow_parser = workflow_subparsers.add_parser('create', help='Create a new workflow')
-    create_workflow_parser.add_argument('--id', required=True, help='Workflow ID')
-    create_workflow_parser.add_argument('--name', required=True, help='Workflow name')
-    create_workflow_parser.add_argument('--scope', required=True, choices=[s.value for s in Scope], help='Workflow scope')
-    create_workflow_parser.add_argument('--description', help='Workflow description')
-    create_workflow_parser.set_defaults(func=create_workflow_command)
-    
-    sync_workflow_parser = workflow_subparsers.add_parser('sync', help='Sync a workflow')
-    sync_workflow_parser.add_argument('--id', required=True, help='Workflow ID')
-    sync_workflow_parser.add_argument('--scope', required=True, choices=[s.value for s in Scope], help='Workflow scope')
-    sync_workflow_parser.add_argument('--direction', choices=['to', 'from'], default='to', help='Sync direction')
-    sync_workflow_parser.set_defaults(func=sync_workflow_command)
-    
-    list_workflows_parser = workflow_subparsers.add_parser('list', help='List all workflows')
-    list_workflows_parser.add_argument('--scope', choices=[s.value for s in Scope], help='Filter by scope')
-    list_workflows_parser.set_defaults(func=list_workflows_command)
-    
-    delete_workflow_parser = workflow_subparsers.add_parser('delete', help='Delete a workflow')
-    delete_workflow_parser.add_argument('--id', required=True, help='Workflow ID')
-    delete_workflow_parser.add_argument('--scope', required=True, choices=[s.value for s in Scope], help='Workflow scope')
-    delete_workflow_parser.set_defaults(func=delete_workflow_command)
-    
-    sync_all_workflows_parser = workflow_subparsers.add_parser('sync-all', help='Sync all workflows')
-    sync_all_workflows_parser.add_argument('--scope', choices=[s.value for s in Scope], help='Filter by scope')
-    sync_all_workflows_parser.set_defaults(func=sync_all_workflows_command)
-    
-    validate_workflow_parser = workflow_subparsers.add_parser('validate', help='Validate a workflow')
-    validate_workflow_parser.add_argument('--id', required=True, help='Workflow ID')
-    validate_workflow_parser.add_argument('--scope', required=True, choices=[s.value for s in Scope], help='Workflow scope')
-    validate_workflow_parser.set_defaults(func=validate_workflow_command)
-    
-    get_workflow_agents_parser = workflow_subparsers.add_parser('agents', help='Get agents referenced by a workflow')
-    get_workflow_agents_parser.add_argument('--id', required=True, help='Workflow ID')
-    get_workflow_agents_parser.add_argument('--scope', required=True, choices=[s.value for s in Scope], help='Workflow scope')
-    get_workflow_agents_parser.set_defaults(func=get_workflow_agents_command)
-    
-    get_agent_workflows_parser = workflow_subparsers.add_parser('referenced-by', help='Get workflows that reference an agent')
-    get_agent_workflows_parser.add_argument('--agent-id', required=True, help='Agent ID')
-    get_agent_workflows_parser.set_defaults(func=get_agent_workflows_command)
 
-    # Tool commands
-    tool_parser = subparsers.add_parser('tool', help='Tool management')
-    tool_subparsers = tool_parser.add_subparsers(dest='tool_command', help='Tool commands', required=True)
-    
-    list_tools_parser = tool_subparsers.add_parser('list', help='List all tools')
-    list_tools_parser.set_defaults(func=list_tools_command)
-    
-    get_tool_parser = tool_subparsers.add_parser('get', help='Get a specific tool')
-    get_tool_parser.add_argument('--id', required=True, help='Tool ID')
-    get_tool_parser.set_defaults(func=get_tool_command)
-    
-    create_tool_parser = tool_subparsers.add_parser('create', help='Create a new tool')
-    create_tool_parser.add_argument('--id', required=True, help='Tool ID')
-    create_tool_parser.add_argument('--name', required=True, help='Tool name')
-    create_tool_parser.add_argument('--description', help='Tool description')
-    create_tool_parser.add_argument('--type', default='custom', help='Tool type')
-    create_tool_parser.add_argument('--api-path', help='Internal API path')
-    create_tool_parser.set_defaults(func=create_tool_command)
-    
-    delete_tool_parser = tool_subparsers.add_parser('delete', help='Delete a tool')
-    delete_tool_parser.add_argument('--id', required=True, help='Tool ID')
-    delete_tool_parser.add_argument('--force', action='store_true', help='Force delete even if associated with agents')
-    delete_tool_parser.set_defaults(func=delete_tool_command)
-    
-    orphaned_tools_parser = tool_subparsers.add_parser('orphaned', help='Find orphaned tools')
-    orphaned_tools_parser.set_defaults(func=orphaned_tools_command)
-    
-    cleanup_tools_parser = tool_subparsers.add_parser('cleanup', help='Cleanup orphaned tools')
-    cleanup_tools_parser.add_argument('--force', action='store_true', help='Force cleanup')
-    cleanup_tools_parser.set_defaults(func=cleanup_tools_command)
-
-    # Global sync command
-    sync_all_parser = subparsers.add_parser('sync-all', help='Sync all agents and workflows')
-    sync_all_parser.add_argument('--scope', choices=[s.value for s in Scope], help='Filter by scope')
-    sync_all_parser.set_defaults(func=sync_all_command)
+PROG = "python -m src.cli"
+
+# Help text of the commands that take a subcommand
+_GROUP_HELP = {
+    'agent': 'Agent management',
+    'workflow': 'Workflow management',
+    'tool': 'Tool management',
+}
+
+# (command, subcommand) -> (help text, argument builder, handler). sync-all has no subcommand.
+# Only the parser of the invoked pair is ever built.
+_DISPATCH = {
+    ('agent', 'create'): ('Create a new agent', _build_agent_create_parser, create_agent_command),
+    ('agent', 'sync'): ('Sync an agent', _build_agent_sync_parser, sync_agent_command),
+    ('agent', 'list'): ('List all agents', _build_scope_filter_parser, list_agents_command),
+    ('agent', 'delete'): ('Delete an agent', _build_agent_delete_parser, delete_agent_command),
+    ('agent', 'sync-all'): ('Sync all agents', _build_scope_filter_parser, sync_all_agents_command),
+    ('workflow', 'create'): ('Create a new workflow', _build_workflow_create_parser, create_workflow_command),
+    ('workflow', 'sync'): ('Sync a workflow', _build_workflow_sync_parser, sync_workflow_command),
+    ('workflow', 'list'): ('List all workflows', _build_scope_filter_parser, list_workflows_command),
+    ('workflow', 'delete'): ('Delete a workflow', _build_workflow_id_parser, delete_workflow_command),
+    ('workflow', 'sync-all'): ('Sync all workflows', _build_workflow_sync_all_parser, sync_all_workflows_command),
+    ('workflow', 'validate'): ('Validate a workflow', _build_workflow_id_parser, validate_workflow_command),
+    ('workflow', 'agents'): ('Get agents referenced by a workflow', _build_workflow_id_parser, get_workflow_agents_command),
+    ('workflow', 'referenced-by'): ('Get workflows that reference an agent', _build_workflow_referenced_by_parser, get_agent_workflows_command),
+    ('tool', 'list'): ('List all tools', _build_no_arguments_parser, list_tools_command),
+    ('tool', 'get'): ('Get a specific tool', _build_tool_get_parser, get_tool_command),
+    ('tool', 'create'): ('Create a new tool', _build_tool_create_parser, create_tool_command),
+    ('tool', 'delete'): ('Delete a tool', _build_tool_delete_parser, delete_tool_command),
+    ('tool', 'orphaned'): ('Find orphaned tools', _build_no_arguments_parser, orphaned_tools_command),
+    ('tool', 'cleanup'): ('Cleanup orphaned tools', _build_tool_cleanup_parser, cleanup_tools_command),
+    ('sync-all', None): ('Sync all agents and workflows', _build_scope_filter_parser, sync_all_command),
+}
+
+# Top-level commands and their help text, in dispatch table order
+COMMANDS = {
+    command: _GROUP_HELP[command] if subcommand is not None else help_text
+    for (command, subcommand), (help_text, _, _) in _DISPATCH.items()
+}
+
+def _choices_text(choices):
+    """Format choices the way argparse shows them in usage lines."""
+    return "{" + ",".join(choices) + "}"
+
+def _top_level_usage():
+    """Top-level help, generated from the dispatch table without building any parser."""
+    choices = _choices_text(COMMANDS)
+    lines = [f"usage: {PROG} [-h] {choices} ...", "", "cc Agents Management System", "",
+             "positional arguments:", f"  {choices}", f"{'':24}Available commands"]
+    lines.extend(f"    {command:<20}{help_text}" for command, help_text in COMMANDS.items())
+    lines.extend(["", "options:", "  -h, --help            show this help message and exit"])
+    return "\n".join(lines) + "\n" + EPILOG.rstrip()
+
+def _command_usage(command):
+    """Help for a command with subcommands, generated from the dispatch table."""
+    subcommands = [(sub, entry[0]) for (cmd, sub), entry in _DISPATCH.items() if cmd == command]
+    choices = _choices_text(sub for sub, _ in subcommands)
+    lines = [f"usage: {PROG} {command} [-h] {choices} ...", "", "positional arguments:", f"  {choices}"]
+    lines.append(f"{'':24}{COMMANDS[command].split()[0]} commands")
+    lines.extend(f"    {sub:<20}{help_text}" for sub, help_text in subcommands)
+    lines.extend(["", "options:", "  -h, --help            show this help message and exit"])
+    return "\n".join(lines)
+
+def _usage_error(usage, message):
+    """Report a command-line error the way argparse does: usage line and message on stderr, exit 2."""
+    sys.stderr.write(f"{usage.splitlines()[0]}\n{PROG}: error: {message}\n")
+    sys.exit(2)
+
+def main():
+    """Main CLI entry point."""
+    argv = sys.argv[1:]
+    
+    # Fast path: top-level help needs neither argparse nor environment validation
+    if not argv or argv[0] in ("-h", "--help"):
+        print(_top_level_usage())
+        sys.exit(0)
+    
+    command = argv[0]
+    if command not in COMMANDS:
+        _usage_error(_top_level_usage(), f"argument command: invalid choice: '{command}' "
+                            f"(choose from {', '.join(repr(c) for c in COMMANDS)})")
+    
+    if (command, None) in _DISPATCH:
+        subcommand, rest = None, argv[1:]
+    else:
+        if len(argv) < 2:
+            _usage_error(_command_usage(command), f"the following arguments are required: {command}_command")
+        subcommand, rest = argv[1], argv[2:]
+        if subcommand in ("-h", "--help"):
+            print(_command_usage(command))
+            sys.exit(0)
+        if (command, subcommand) not in _DISPATCH:
+            choices = ', '.join(repr(sub) for cmd, sub in _DISPATCH if cmd == command)
+            _usage_error(_command_usage(command), f"argument {command}_command: invalid choice: "
+                                                  f"'{subcommand}' (choose from {choices})")
+    
+    help_text, build, handler = _DISPATCH[(command, subcommand)]
+    parser = argparse.ArgumentParser(
+        prog=f"{PROG} {command}" + (f" {subcommand}" if subcommand else ""),
+        description=help_text
+    )
+    build(parser)
+    args = parser.parse_args(rest)
+    args.command = command
     
-    args = parser.parse_args()
+    if not error_handler.validate_environment():
+        sys.exit(1)
     
     try:
-        args.func(args)
+        handler(args)
     except Exception as e:
-        error_handler.handle_error(e, {"command": args.command})
+        error_handler.handle_error(e, {"command": command})
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
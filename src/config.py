@@ -3,14 +3,27 @@ Configuration and database connection management for the cc Agents system.
 """
 
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from dotenv import load_dotenv
-from typing import Optional
+import json
+import mmap
+import atexit
+import hashlib
+import functools
+from typing import Dict, Optional
 from enum import Enum
 
-# Load environment variables
-load_dotenv('local.env')
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library json module
+    orjson = None
+
+# Prefault schema mappings up front (MAP_POPULATE) on platforms that support it
+MMAP_READ_FLAGS = (mmap.MAP_PRIVATE | getattr(mmap, 'MAP_POPULATE', 0)) if hasattr(mmap, 'MAP_PRIVATE') else None
+
+@functools.lru_cache(maxsize=1)
+def _load_env():
+    """Load environment variables from local.env, once, on first database use."""
+    from dotenv import load_dotenv
+    load_dotenv('local.env')
 
 class Scope(Enum):
     """Enum for agent and workflow scopes."""
@@ -24,17 +37,80 @@ class ResourceType(Enum):
     WORKFLOW_NODE = "workflow_node"
     WORKFLOW_EDGE = "workflow_edge"
 
-def get_db_connection():
-    """Create a database connection using environment variables."""
+# Pool bounds: a CLI run usually needs one connection, test harnesses and scripts may hold a few at once
+POOL_MIN_CONNECTIONS = 1
+POOL_MAX_CONNECTIONS = 16
+
+@functools.lru_cache(maxsize=1)
+def _get_pool():
+    """Create the process-wide connection pool on first database use."""
+    from psycopg2.pool import ThreadedConnectionPool
+    
+    _load_env()
+    database_url = os.getenv('PG_DATABASE_URL')
+    if not database_url:
+        raise ValueError("PG_DATABASE_URL environment variable not set")
+    pool = ThreadedConnectionPool(POOL_MIN_CONNECTIONS, POOL_MAX_CONNECTIONS, database_url)
+    atexit.register(pool.closeall)
+    return pool
+
+def get_database_key() -> str:
+    """Identify the database PG_DATABASE_URL points at, without connecting or exposing its credentials."""
+    _load_env()
     database_url = os.getenv('PG_DATABASE_URL')
     if not database_url:
         raise ValueError("PG_DATABASE_URL environment variable not set")
-    return psycopg2.connect(database_url)
+    return hashlib.sha256(database_url.encode('utf-8')).hexdigest()[:16]
+
+def get_db_connection():
+    """Check a connection out of the pool; hand it back with release_db_connection."""
+    return _get_pool().getconn()
+
+def release_db_connection(connection):
+    """Return a connection to the pool; an open transaction on it is rolled back, not committed."""
+    _get_pool().putconn(connection)
+
+class DBSession:
+    """One connection shared by several managers: committed on success, rolled back on error."""
+    
+    def __init__(self):
+        self.conn = None
+    
+    def __enter__(self):
+        """Context manager entry."""
+        self.conn = get_db_connection()
+        return self.conn
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        if self.conn:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+            release_db_connection(self.conn)
+
+def prepare_statements(connection, statements: Dict[str, str]):
+    """PREPARE each named statement on the connection's session unless it already is.
+
+    Prepared statements live as long as the session, so callers EXECUTE them by name and the server
+    parses and plans the SQL once instead of on every row of a bulk sync. Pooled connections keep
+    their session, so each physical connection only prepares a statement the first time.
+    """
+    with connection.cursor() as cur:
+        cur.execute("SELECT name FROM pg_prepared_statements WHERE name = ANY(%s)", (list(statements),))
+        prepared = {row[0] for row in cur.fetchall()}
+        for name, sql in statements.items():
+            if name not in prepared:
+                cur.execute(f"PREPARE {name} AS {sql}")
 
 def get_db_cursor(connection):
-    """Get a RealDictCursor for database operations."""
+    """Get a RealDictCursor for database operations; its rows are already dicts, so callers need not copy them."""
+    from psycopg2.extras import RealDictCursor
+    
     return connection.cursor(cursor_factory=RealDictCursor)
 
+@functools.lru_cache(maxsize=None)
 def validate_scope(scope: str) -> Scope:
     """Validate and return a Scope enum from string."""
     try:
@@ -42,6 +118,7 @@ def validate_scope(scope: str) -> Scope:
     except ValueError:
         raise ValueError(f"Invalid scope: {scope}. Must be one of: {[s.value for s in Scope]}")
 
+@functools.lru_cache(maxsize=None)
 def validate_resource_type(resource_type: str) -> ResourceType:
     """Validate and return a ResourceType enum from string."""
     try:
@@ -49,12 +126,87 @@ def validate_resource_type(resource_type: str) -> ResourceType:
     except ValueError:
         raise ValueError(f"Invalid resource type: {resource_type}. Must be one of: {[rt.value for rt in ResourceType]}")
 
+# Every (scope, resource type) definitions path, computed once at import
+_DEFINITIONS_PATHS = {
+    (scope, resource_type): os.path.join(
+        "definitions",
+        "System" if scope == Scope.SYSTEM else "CommonBackground",
+        "Agents" if resource_type == ResourceType.AGENT else "AgenticWorkflows"
+    )
+    for scope in Scope
+    for resource_type in ResourceType
+}
+
 def get_definitions_path(scope: Scope, resource_type: ResourceType) -> str:
     """Get the path for a specific scope and resource type."""
-    scope_dir = "System" if scope == Scope.SYSTEM else "CommonBackground"
-    resource_dir = "Agents" if resource_type == ResourceType.AGENT else "AgenticWorkflows"
-    return os.path.join("definitions", scope_dir, resource_dir)
+    return _DEFINITIONS_PATHS[scope, resource_type]
+
+# Directories already created or confirmed by ensure_directory_exists in this process
+_ENSURED_DIRECTORIES = set()
 
 def ensure_directory_exists(path: str):
     """Ensure a directory exists, creating it if necessary."""
-    os.makedirs(path, exist_ok=True) 
\ No newline at end of file
+    if path in _ENSURED_DIRECTORIES:
+        return
+    os.makedirs(path, exist_ok=True)
+    _ENSURED_DIRECTORIES.add(path)
+
+def load_json_file(path: str):
+    """Parse a JSON file through a read-only memory map instead of reading it into a str."""
+    with open(path, 'rb') as f:
+        fd = f.fileno()
+        if not os.fstat(fd).st_size:
+            return json.loads(b'')  # mmap can't map an empty file; raise the usual JSONDecodeError
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        if MMAP_READ_FLAGS is None:
+            mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        else:
+            mm = mmap.mmap(fd, 0, flags=MMAP_READ_FLAGS, prot=mmap.PROT_READ)
+        with mm:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            if orjson:
+                with memoryview(mm) as view:
+                    return orjson.loads(view)
+            return json.loads(mm[:])
+
+def write_file_if_changed(path: str, data: bytes) -> bool:
+    """Write data to path unless the file already holds exactly these bytes; returns whether it wrote."""
+    try:
+        if os.stat(path).st_size == len(data):
+            with open(path, 'rb') as f:
+                if f.read() == data:
+                    return False
+    except FileNotFoundError:
+        pass
+    
+    # Unbuffered write straight to the fd; no fsync, these files are regenerated from the database
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+    return True
+
+def json_loads(data: bytes):
+    """Parse JSON from bytes, with orjson when it is installed."""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_dumps(data) -> str:
+    """Serialize data compactly, with orjson when it is installed; usable as psycopg2's Json(dumps=...)."""
+    if orjson:
+        return orjson.dumps(data).decode('utf-8')
+    return json.dumps(data)
+
+def dump_json_file(path: str, data) -> bool:
+    """Write data as indented JSON, using orjson when it is installed; unchanged files are left alone."""
+    if orjson:
+        content = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    else:
+        content = json.dumps(data, indent=2).encode('utf-8')
+    return write_file_if_changed(path, content)
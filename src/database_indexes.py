@@ -0,0 +1,39 @@
+"""
+Database index setup for the cc Agents system.
+Creates the indexes the managers' lookups rely on, without blocking writes.
+"""
+
+from .config import get_db_connection, release_db_connection
+
+# (index name, table, column list) created if missing
+INDEXES = [
+    # Orphaned tool lookups probe associations by tool_id; the primary key leads with agent_id
+    ("ix_system_agent_tool_tool_id", "system_agent_tool", "tool_id"),
+]
+
+def create_indexes():
+    """Create any missing index with CREATE INDEX CONCURRENTLY."""
+    conn = get_db_connection()
+    try:
+        # CONCURRENTLY can't run inside a transaction block
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            for name, table, columns in INDEXES:
+                cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})")
+                print(f"  ✅ {name} on {table} ({columns})")
+    finally:
+        # The connection goes back to the pool; later users expect transactions
+        conn.autocommit = False
+        release_db_connection(conn)
+
+def main():
+    """Main function."""
+    print("🔄 Creating cc Agents database indexes...")
+    try:
+        create_indexes()
+        print("✅ Indexes are in place")
+    except Exception as e:
+        print(f"❌ Failed to create indexes: {str(e)}")
+
+if __name__ == "__main__":
+    main()
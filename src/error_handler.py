@@ -3,10 +3,13 @@ Error handling and logging for the cc Agents system.
 Provides clear, actionable error messages to users.
 """
 
+import os
+import re
 import sys
-import traceback
 import logging
-from typing import Optional, Dict, Any
+import functools
+from logging.handlers import MemoryHandler
+from typing import Optional, Dict, Any, Callable
 from enum import Enum
 
 class ErrorType(Enum):
@@ -19,6 +22,122 @@ class ErrorType(Enum):
     NETWORK = "network"
     UNKNOWN = "unknown"
 
+# Keywords that classify an error message, in priority order: the first type with a match wins
+_ERROR_KEYWORDS = (
+    (ErrorType.DATABASE_CONNECTION, ('connection', 'database', 'postgresql')),
+    (ErrorType.VALIDATION, ('validation', 'invalid', 'required')),
+    (ErrorType.FILE_NOT_FOUND, ('file', 'not found', 'no such file')),
+    (ErrorType.PERMISSION, ('permission', 'access', 'denied')),
+    (ErrorType.CONFIGURATION, ('config', 'environment', 'env')),
+    (ErrorType.NETWORK, ('network', 'timeout', 'connection refused')),
+)
+
+# Keyword -> index of its highest-priority entry in _ERROR_KEYWORDS
+_KEYWORD_RANKS = {
+    word: rank
+    for rank, (_, words) in reversed(list(enumerate(_ERROR_KEYWORDS)))
+    for word in words
+}
+
+# One pass over the message: the lookahead reports a keyword at every start position, so matches
+# may overlap, and alternatives are ordered by priority for keywords sharing a start position
+_KEYWORD_PATTERN = re.compile(
+    "(?=(" + "|".join(re.escape(word) for word in sorted(_KEYWORD_RANKS, key=_KEYWORD_RANKS.get)) + "))"
+)
+
+# User-facing message templates per error type
+_USER_MESSAGES = {
+    ErrorType.DATABASE_CONNECTION: "Database connection failed: {base_message}\n\nThis usually means:\n• Database is not running\n• Connection credentials are incorrect\n• Network connectivity issues",
+    ErrorType.VALIDATION: "Validation error: {base_message}\n\nPlease check your input parameters and try again.",
+    ErrorType.FILE_NOT_FOUND: "File not found: {base_message}\n\nThis usually means:\n• The agent/workflow doesn't exist\n• File permissions are incorrect\n• Path is wrong",
+    ErrorType.PERMISSION: "Permission denied: {base_message}\n\nThis usually means:\n• Insufficient file permissions\n• Database access denied\n• Network access restricted",
+    ErrorType.CONFIGURATION: "Configuration error: {base_message}\n\nThis usually means:\n• Missing environment variables\n• Incorrect configuration\n• Missing required files",
+    ErrorType.NETWORK: "Network error: {base_message}\n\nThis usually means:\n• Network connectivity issues\n• Firewall blocking connection\n• Service unavailable",
+}
+_UNKNOWN_MESSAGE = "An unexpected error occurred: {base_message}\n\nPlease check the logs for more details."
+
+# Troubleshooting tips per error type, followed by the general tips for every error
+_TIPS = {
+    ErrorType.DATABASE_CONNECTION: (
+        "Check that PostgreSQL is running: `brew services list | grep postgresql`",
+        "Verify your database connection in `local.env`",
+        "Test connection: `psql $PG_DATABASE_URL`",
+        "Check network connectivity to database host",
+    ),
+    ErrorType.VALIDATION: (
+        "Run `python -m src.cli --help` to see valid options",
+        "Check that all required parameters are provided",
+        "Verify scope values: SYSTEM or COMMON_BACKGROUND",
+        "Ensure agent/workflow names are valid",
+    ),
+    ErrorType.FILE_NOT_FOUND: (
+        "Run `python -m src.cli agent list` to see available agents",
+        "Run `python -m src.cli workflow list` to see available workflows",
+        "Check that files exist in `definitions/` directory",
+        "Verify file permissions: `ls -la definitions/`",
+    ),
+    ErrorType.PERMISSION: (
+        "Check file permissions: `ls -la definitions/`",
+        "Check database permissions",
+        "Try running with elevated permissions if needed",
+        "Verify user has access to database",
+    ),
+    ErrorType.CONFIGURATION: (
+        "Check that `local.env` exists and is properly configured",
+        "Verify all required environment variables are set",
+        "Run `python -m src.test_system` to test configuration",
+        "Check that all required Python packages are installed",
+    ),
+    ErrorType.NETWORK: (
+        "Check network connectivity: `ping <host>`",
+        "Verify firewall settings",
+        "Check VPN connection if applicable",
+        "Try again in a few minutes",
+    ),
+}
+_GENERAL_TIPS = (
+    "Check the log file: `tail -f cc_agents.log`",
+    "Run with verbose logging for more details",
+    "Try the operation with a smaller scope first",
+)
+
+_REQUIRED_ENV_VARS = ('PG_DATABASE_URL',)
+
+# _environment_key() as of the last successful validate_environment; failures are not cached
+# so their messages are printed every time
+_valid_environment_key = None
+
+# The rendered troubleshooting section per error type; the tips are constant, so render them once
+_TROUBLESHOOTING_BLOCKS = {
+    error_type: "\n💡 Troubleshooting:\n" + "\n".join(f"   • {tip}" for tip in _TIPS.get(error_type, ()) + _GENERAL_TIPS)
+    for error_type in ErrorType
+}
+
+def _configure_logging():
+    """Configure the root logger once per process, like logging.basicConfig did.
+    
+    Log file records are buffered and written in batches: when 512 have accumulated, on an
+    ERROR, or at exit, when logging's shutdown hook flushes and closes the handlers. The batches
+    are written on the logging thread; with writes this rare a QueueListener thread saves nothing
+    and leaves records to be lost if the process dies before the queue drains.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    # delay=True creates the file on the first write; the MemoryHandler's batches stand in for a
+    # larger write buffer, so a plain FileHandler is enough
+    file_handler = logging.FileHandler('cc_agents.log', delay=True)
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+    log_file_buffer = MemoryHandler(capacity=512, flushLevel=logging.ERROR, target=file_handler)
+    
+    root.setLevel(logging.INFO)
+    root.addHandler(log_file_buffer)
+    root.addHandler(stream_handler)
+
 class ErrorHandler:
     """Handles errors with clear, actionable messages."""
     
@@ -27,14 +146,7 @@ class ErrorHandler:
     
     def setup_logging(self):
         """Setup logging configuration."""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('cc_agents.log'),
-                logging.StreamHandler(sys.stdout)
-            ]
-        )
+        _configure_logging()
         self.logger = logging.getLogger(__name__)
     
     def handle_error(self, error: Exception, context: Optional[Dict[str, Any]] = None) -> None:
@@ -42,26 +154,22 @@ class ErrorHandler:
         error_type = self._classify_error(error)
         
         # Log the full error for debugging
-        self.logger.error(f"Error occurred: {str(error)}", exc_info=True)
+        self.logger.error("Error occurred: %s", error, exc_info=True)
         
         # Get user-friendly message
         user_message = self._get_user_message(error, error_type, context)
         
-        # Print user-friendly message
-        print(f"\n❌ {user_message}")
+        # Build the user-friendly message, context and troubleshooting tips, then write them at once
+        lines = [f"\n❌ {user_message}"]
         
-        # Print additional context if available
         if context:
-            print(f"\n📋 Context:")
-            for key, value in context.items():
-                print(f"   {key}: {value}")
+            lines.append("\n📋 Context:")
+            lines.extend(f"   {key}: {value}" for key, value in context.items())
+        
+        lines.append(_TROUBLESHOOTING_BLOCKS[error_type])
         
-        # Print troubleshooting tips
-        troubleshooting = self._get_troubleshooting_tips(error_type, context)
-        if troubleshooting:
-            print(f"\n💡 Troubleshooting:")
-            for tip in troubleshooting:
-                print(f"   • {tip}")
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
         
         # Exit with appropriate code
         sys.exit(1)
@@ -70,128 +178,47 @@ class ErrorHandler:
         """Classify the type of error."""
         error_str = str(error).lower()
         
-        if any(word in error_str for word in ['connection', 'database', 'postgresql']):
-            return ErrorType.DATABASE_CONNECTION
-        elif any(word in error_str for word in ['validation', 'invalid', 'required']):
-            return ErrorType.VALIDATION
-        elif any(word in error_str for word in ['file', 'not found', 'no such file']):
-            return ErrorType.FILE_NOT_FOUND
-        elif any(word in error_str for word in ['permission', 'access', 'denied']):
-            return ErrorType.PERMISSION
-        elif any(word in error_str for word in ['config', 'environment', 'env']):
-            return ErrorType.CONFIGURATION
-        elif any(word in error_str for word in ['network', 'timeout', 'connection refused']):
-            return ErrorType.NETWORK
-        else:
-            return ErrorType.UNKNOWN
+        rank = min((_KEYWORD_RANKS[match.group(1)] for match in _KEYWORD_PATTERN.finditer(error_str)), default=None)
+        return ErrorType.UNKNOWN if rank is None else _ERROR_KEYWORDS[rank][0]
     
     def _get_user_message(self, error: Exception, error_type: ErrorType, context: Optional[Dict[str, Any]]) -> str:
         """Get a user-friendly error message."""
-        base_message = str(error)
-        
-        if error_type == ErrorType.DATABASE_CONNECTION:
-            return f"Database connection failed: {base_message}\n\nThis usually means:\n• Database is not running\n• Connection credentials are incorrect\n• Network connectivity issues"
-        
-        elif error_type == ErrorType.VALIDATION:
-            return f"Validation error: {base_message}\n\nPlease check your input parameters and try again."
-        
-        elif error_type == ErrorType.FILE_NOT_FOUND:
-            return f"File not found: {base_message}\n\nThis usually means:\n• The agent/workflow doesn't exist\n• File permissions are incorrect\n• Path is wrong"
-        
-        elif error_type == ErrorType.PERMISSION:
-            return f"Permission denied: {base_message}\n\nThis usually means:\n• Insufficient file permissions\n• Database access denied\n• Network access restricted"
-        
-        elif error_type == ErrorType.CONFIGURATION:
-            return f"Configuration error: {base_message}\n\nThis usually means:\n• Missing environment variables\n• Incorrect configuration\n• Missing required files"
-        
-        elif error_type == ErrorType.NETWORK:
-            return f"Network error: {base_message}\n\nThis usually means:\n• Network connectivity issues\n• Firewall blocking connection\n• Service unavailable"
-        
-        else:
-            return f"An unexpected error occurred: {base_message}\n\nPlease check the logs for more details."
-    
-    def _get_troubleshooting_tips(self, error_type: ErrorType, context: Optional[Dict[str, Any]]) -> list:
-        """Get troubleshooting tips based on error type."""
-        tips = []
-        
-        if error_type == ErrorType.DATABASE_CONNECTION:
-            tips.extend([
-                "Check that PostgreSQL is running: `brew services list | grep postgresql`",
-                "Verify your database connection in `local.env`",
-                "Test connection: `psql $PG_DATABASE_URL`",
-                "Check network connectivity to database host"
-            ])
-        
-        elif error_type == ErrorType.VALIDATION:
-            tips.extend([
-                "Run `python -m src.cli --help` to see valid options",
-                "Check that all required parameters are provided",
-                "Verify scope values: SYSTEM or COMMON_BACKGROUND",
-                "Ensure agent/workflow names are valid"
-            ])
-        
-        elif error_type == ErrorType.FILE_NOT_FOUND:
-            tips.extend([
-                "Run `python -m src.cli agent list` to see available agents",
-                "Run `python -m src.cli workflow list` to see available workflows",
-                "Check that files exist in `definitions/` directory",
-                "Verify file permissions: `ls -la definitions/`"
-            ])
-        
-        elif error_type == ErrorType.PERMISSION:
-            tips.extend([
-                "Check file permissions: `ls -la definitions/`",
-                "Check database permissions",
-                "Try running with elevated permissions if needed",
-                "Verify user has access to database"
-            ])
-        
-        elif error_type == ErrorType.CONFIGURATION:
-            tips.extend([
-                "Check that `local.env` exists and is properly configured",
-                "Verify all required environment variables are set",
-                "Run `python -m src.test_system` to test configuration",
-                "Check that all required Python packages are installed"
-            ])
-        
-        elif error_type == ErrorType.NETWORK:
-            tips.extend([
-                "Check network connectivity: `ping <host>`",
-                "Verify firewall settings",
-                "Check VPN connection if applicable",
-                "Try again in a few minutes"
-            ])
-        
-        # Add general tips
-        tips.extend([
-            "Check the log file: `tail -f cc_agents.log`",
-            "Run with verbose logging for more details",
-            "Try the operation with a smaller scope first"
-        ])
-        
-        return tips
+        return _USER_MESSAGES.get(error_type, _UNKNOWN_MESSAGE).format(base_message=str(error))
     
     def log_operation_start(self, operation: str, context: Dict[str, Any] = None):
         """Log the start of an operation."""
-        message = f"Starting operation: {operation}"
         if context:
-            message += f" with context: {context}"
-        self.logger.info(message)
+            self.logger.info("Starting operation: %s with context: %s", operation, context)
+        else:
+            self.logger.info("Starting operation: %s", operation)
     
     def log_operation_success(self, operation: str, result: Any = None):
         """Log successful completion of an operation."""
-        message = f"Successfully completed: {operation}"
         if result:
-            message += f" with result: {result}"
-        self.logger.info(message)
+            self.logger.info("Successfully completed: %s with result: %s", operation, result)
+        else:
+            self.logger.info("Successfully completed: %s", operation)
     
     def log_operation_failure(self, operation: str, error: Exception):
         """Log failure of an operation."""
-        self.logger.error(f"Failed to complete: {operation} - {str(error)}")
+        self.logger.error("Failed to complete: %s - %s", operation, error)
+    
+    @staticmethod
+    def _environment_key() -> tuple:
+        """What validate_environment depends on: local.env's mtime and the required variables."""
+        try:
+            env_file_mtime = os.stat('local.env').st_mtime_ns
+        except FileNotFoundError:
+            env_file_mtime = None
+        return (env_file_mtime,) + tuple(os.environ.get(var) for var in _REQUIRED_ENV_VARS)
     
     def validate_environment(self) -> bool:
         """Validate that the environment is properly configured."""
-        import os
+        global _valid_environment_key
+        # A successful check stays valid until local.env or a required variable changes
+        if _valid_environment_key is not None and _valid_environment_key == self._environment_key():
+            return True
+        
         from dotenv import load_dotenv
         
         # Check if local.env exists
@@ -204,19 +231,36 @@ class ErrorHandler:
         load_dotenv('local.env')
         
         # Check required environment variables
-        required_vars = ['PG_DATABASE_URL']
-        missing_vars = []
-        
-        for var in required_vars:
-            if not os.getenv(var):
-                missing_vars.append(var)
+        missing_vars = [var for var in _REQUIRED_ENV_VARS if not os.getenv(var)]
         
         if missing_vars:
             print(f"❌ Missing required environment variables: {', '.join(missing_vars)}")
             print("💡 Please set these variables in your local.env file")
             return False
         
+        _valid_environment_key = self._environment_key()
         return True
 
 # Global error handler instance
-error_handler = ErrorHandler() 
\ No newline at end of file
+error_handler = ErrorHandler() 
+
+def logged_operation(operation: str, get_context: Callable[[Any], Dict[str, Any]]):
+    """Decorate a CLI command handler with start/success/failure logging and error handling.
+    
+    ``get_context(args)`` builds the context once; it is logged at the start and passed to
+    ``handle_error`` on failure. The handler's return value is logged as the result.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(args):
+            context = get_context(args)
+            try:
+                error_handler.log_operation_start(operation, context)
+                result = func(args)
+                error_handler.log_operation_success(operation, result)
+                return result
+            except Exception as e:
+                error_handler.log_operation_failure(operation, e)
+                error_handler.handle_error(e, {"operation": operation, **context})
+        return wrapper
+    return decorator
@@ -4,17 +4,18 @@ Verifies that the new system works correctly with database and file operations.
 """
 
 import os
+import uuid
 import tempfile
 import shutil
-from .config import Scope, ResourceType, get_definitions_path
+from .config import Scope, ResourceType, get_definitions_path, dump_json_file, get_db_connection, release_db_connection
 from .agent_manager import AgentManager
 from .workflow_manager import WorkflowManager
 
-def test_agent_operations():
-    """Test agent creation and management."""
+def test_agent_operations(conn=None):
+    """Test agent creation and management, on the given connection or a new one."""
     print("🧪 Testing agent operations...")
     
-    with AgentManager() as am:
+    with AgentManager(conn) as am:
         # Test creating an agent
         agent_id = am.create_agent(
             name="test-agent",
@@ -36,11 +37,43 @@ def test_agent_operations():
         deleted = am.delete_agent("test-agent", Scope.SYSTEM)
         print(f"  ✅ Deleted agent: {deleted}")
 
-def test_workflow_operations():
-    """Test workflow creation and management."""
+def test_tool_operations(conn=None):
+    """Test syncing an agent's tools, on the given connection or a new one."""
+    print("🧪 Testing tool operations...")
+    
+    with AgentManager(conn) as am:
+        agent_id = am.create_agent(
+            name="test-tool-agent",
+            scope=Scope.SYSTEM,
+            description="An agent for the tool tests"
+        )
+        tool_id = str(uuid.uuid4())
+        
+        # A tool without a function name syncs under a default name and keeps its association
+        tools = [{"toolId": tool_id, "type": "function", "function": {"description": "A test tool"}}]
+        am.tool_manager.sync_agent_tools(agent_id, tools, Scope.SYSTEM)
+        results = am.tool_manager.sync_agent_tools(agent_id, tools, Scope.SYSTEM)
+        associated = am.tool_manager.get_agent_tool_ids([agent_id], Scope.SYSTEM).get(agent_id, set())
+        if tool_id not in associated or results["removed"]:
+            raise AssertionError(f"Tool without a name lost its association: {results}")
+        print("  ✅ Tool without a name kept its association")
+        
+        # A toolId that is not a UUID is reported and skipped; the valid tool stays associated
+        results = am.tool_manager.sync_agent_tools(
+            agent_id, tools + [{"toolId": "not-a-uuid", "function": {"name": "bad"}}], Scope.SYSTEM
+        )
+        if len(results["failed"]) != 1 or results["removed"]:
+            raise AssertionError(f"Invalid toolId was not skipped on its own: {results}")
+        print(f"  ✅ Reported invalid tool: {results['failed'][0]}")
+        
+        am.delete_agent("test-tool-agent", Scope.SYSTEM)
+        am.tool_manager.delete_tool(tool_id, force=True)
+
+def test_workflow_operations(conn=None):
+    """Test workflow creation and management, on the given connection or a new one."""
     print("🧪 Testing workflow operations...")
     
-    with WorkflowManager() as wm:
+    with WorkflowManager(conn) as wm:
         # Test creating a workflow
         workflow_id = wm.create_workflow(
             workflow_id="test-workflow",
@@ -62,6 +95,46 @@ def test_workflow_operations():
         deleted = wm.delete_workflow("test-workflow", Scope.SYSTEM)
         print(f"  ✅ Deleted workflow: {deleted}")
 
+def test_sync_state_per_database():
+    """Test that the --changed-only sync state is kept per target database."""
+    print("🧪 Testing sync state per database...")
+    
+    workflow_id = "test-sync-state"
+    workflow_dir = os.path.join(get_definitions_path(Scope.SYSTEM, ResourceType.WORKFLOW), workflow_id)
+    original_url = os.environ.get('PG_DATABASE_URL')
+    state_paths = []
+    wm = WorkflowManager()  # reading files and saving the state need no connection
+    
+    def read_as_changed(database_url):
+        """Read with changed_only against database_url and record it as synced; True if the test workflow was read."""
+        os.environ['PG_DATABASE_URL'] = database_url
+        entries = wm.read_all_workflow_files(Scope.SYSTEM, changed_only=True)[Scope.SYSTEM]
+        state_paths.append(wm._file_fingerprints[Scope.SYSTEM][0])
+        wm._save_sync_state(set())
+        return any(entry_id == workflow_id for entry_id, _ in entries)
+    
+    try:
+        os.makedirs(workflow_dir, exist_ok=True)
+        dump_json_file(os.path.join(workflow_dir, 'workflow.json'),
+                       {"id": workflow_id, "name": "Test Sync State", "nodes": [], "edges": []})
+        
+        local, prod = "postgresql://test@localhost/local", "postgresql://test@prod.example/prod"
+        if not read_as_changed(local) or read_as_changed(local):
+            raise AssertionError("Workflow synced to the local database was not skipped the second time")
+        print("  ✅ Unchanged workflow skipped for the database it was synced to")
+        
+        if not read_as_changed(prod):
+            raise AssertionError("Workflow synced to another database was skipped")
+        print("  ✅ Same workflow still synced to a different database")
+    finally:
+        if original_url is None:
+            os.environ.pop('PG_DATABASE_URL', None)
+        else:
+            os.environ['PG_DATABASE_URL'] = original_url
+        shutil.rmtree(workflow_dir, ignore_errors=True)
+        for state_path in set(state_paths):
+            os.remove(state_path)
+
 def test_file_structure():
     """Test that the file structure is created correctly."""
     print("🧪 Testing file structure...")
@@ -116,10 +189,23 @@ def main():
         test_file_structure()
         print()
         
-        test_agent_operations()
-        print()
+        # The database tests share one connection and transaction, always rolled back so a run
+        # leaves no test rows behind
+        conn = get_db_connection()
+        try:
+            test_agent_operations(conn)
+            print()
+            
+            test_tool_operations(conn)
+            print()
+            
+            test_workflow_operations(conn)
+            print()
+        finally:
+            conn.rollback()
+            release_db_connection(conn)
         
-        test_workflow_operations()
+        test_sync_state_per_database()
         print()
         
         print("✅ All tests passed!")
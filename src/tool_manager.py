@@ -4,21 +4,70 @@ Handles tool creation, updates, associations, and cleanup with proper edge case
 """
 
 import os
-import json
 import uuid
-from typing import Dict, List, Optional, Set
-from .config import get_db_connection, get_db_cursor, Scope, ResourceType, get_definitions_path, ensure_directory_exists
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from psycopg2.extras import Json, execute_values
+from .config import get_db_connection, release_db_connection, get_db_cursor, prepare_statements, json_dumps, Scope, ResourceType, get_definitions_path, ensure_directory_exists
 
 class ToolManager:
-    """Manages tool operations including creation, updates, associations, and cleanup."""
+    """Manages tool operations including creation, updates, associations, and cleanup.
     
-    def __init__(self):
-        self.conn = None
+    Use it as a context manager: on a connection it owns, all changes are committed together
+    on a clean exit and rolled back if the block raises.
+    """
+    
+    # CCRM only has system_agent_tool table (no schema prefix, no common_background variant)
+    AGENT_TOOL_TABLE_NAMES = {
+        Scope.SYSTEM: "system_agent_tool",
+        Scope.COMMON_BACKGROUND: "system_agent_tool",
+    }
+    
+    # Single-row lookups and association changes, prepared once per session and run with EXECUTE;
+    # the agent-tool statements exist per scope, named with the scope as suffix
+    PREPARED_STATEMENTS = {
+        "tool_get": "SELECT * FROM system_tool WHERE id = $1",
+        "tool_update": """
+            UPDATE system_tool SET
+                tool_name = COALESCE($1, tool_name),
+                description_for_llm = COALESCE($2, description_for_llm),
+                tool_type = COALESCE($3, tool_type),
+                internal_api_path = COALESCE($4, internal_api_path),
+                json_schema = COALESCE($5, json_schema),
+                updated_at = NOW()
+            WHERE id = $6
+        """,
+        **{
+            f"{name}_{scope.value.lower()}": sql.format(table=table_name)
+            for scope, table_name in AGENT_TOOL_TABLE_NAMES.items()
+            for name, sql in (
+                ("agent_tools_get", """
+                    SELECT t.* FROM system_tool t
+                    JOIN {table} at ON t.id = at.tool_id
+                    WHERE at.agent_id = $1
+                    ORDER BY t.tool_name
+                """),
+                ("agent_tool_insert", """
+                    INSERT INTO {table} (agent_id, tool_id)
+                    VALUES ($1, $2)
+                    ON CONFLICT (agent_id, tool_id) DO NOTHING
+                """),
+                ("agent_tool_delete", "DELETE FROM {table} WHERE agent_id = $1 AND tool_id = $2"),
+            )
+        },
+    }
+    
+    def __init__(self, conn=None):
+        # A connection passed in is borrowed: the owner controls its transaction and lifetime
+        self.conn = conn
         self.cursor = None
+        self._owns_conn = conn is None
+        self._statements_prepared = False
     
     def __enter__(self):
         """Context manager entry."""
-        self.conn = get_db_connection()
+        if self._owns_conn:
+            self.conn = get_db_connection()
         self.cursor = get_db_cursor(self.conn)
         return self
     
@@ -26,25 +75,63 @@ class ToolManager:
         """Context manager exit."""
         if self.cursor:
             self.cursor.close()
-        if self.conn:
-            self.conn.close()
+        if self.conn and self._owns_conn:
+            # One commit per manager instead of one per statement
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+            release_db_connection(self.conn)
+
+    def _prepare_statements(self):
+        """Prepare PREPARED_STATEMENTS on first use, so commands that never need them skip the round trips."""
+        if not self._statements_prepared:
+            prepare_statements(self.conn, self.PREPARED_STATEMENTS)
+            self._statements_prepared = True
+
+    def _execute_prepared(self, name: str, params: tuple, scope: Optional[Scope] = None):
+        """EXECUTE a statement from PREPARED_STATEMENTS, picking the scope's variant when given."""
+        self._prepare_statements()
+        if scope is not None:
+            self._get_agent_tool_table_name(scope)  # reject unknown scopes
+            name = f"{name}_{scope.value.lower()}"
+        self.cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
 
     def _get_agent_tool_table_name(self, scope: Scope) -> str:
         """Get the correct agent-tool table name based on the scope."""
-        # CCRM only has system_agent_tool table (no schema prefix, no common_background variant)
-        return "system_agent_tool"
+        try:
+            return self.AGENT_TOOL_TABLE_NAMES[scope]
+        except KeyError:
+            raise ValueError(f"Invalid scope: {scope}")
 
-    def create_tool(self, tool_id: str, tool_name: str, description: str = "", 
-                   tool_type: str = "custom", internal_api_path: str = None, 
-                   json_schema: Dict = None) -> str:
-        """Create a new tool in the database."""
-        if not json_schema:
-            json_schema = {}
-        
-        self.cursor.execute("""
+    @staticmethod
+    def _schema_param(json_schema: Union[Dict, str, None]):
+        """json_schema as a query parameter: JSON text passes through as is, anything else is serialized once."""
+        if isinstance(json_schema, str):
+            return json_schema
+        return Json(json_schema or {}, dumps=json_dumps)
+
+    @staticmethod
+    def _build_tool_row(tool_id: str, tool_name: str, description: str = "",
+                        tool_type: str = "custom", internal_api_path: str = None,
+                        json_schema: Union[Dict, str] = None) -> Tuple:
+        """Build a system_tool row in the column order of _bulk_upsert_tools."""
+        return (
+            tool_id,
+            tool_name,
+            description,
+            ToolManager._schema_param(json_schema),
+            tool_type,
+            internal_api_path,
+            True
+        )
+    
+    def _bulk_upsert_tools(self, rows: List[Tuple]):
+        """Insert or update system_tool rows built by _build_tool_row, in one statement per page."""
+        execute_values(self.cursor, """
             INSERT INTO system_tool
             (id, tool_name, description_for_llm, json_schema, tool_type, internal_api_path, is_system_tool)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            VALUES %s
             ON CONFLICT (id) DO UPDATE SET
                 tool_name = EXCLUDED.tool_name,
                 description_for_llm = EXCLUDED.description_for_llm,
@@ -52,151 +139,151 @@ class ToolManager:
                 tool_type = EXCLUDED.tool_type,
                 internal_api_path = EXCLUDED.internal_api_path,
                 updated_at = NOW()
-        """, (
-            tool_id,
-            tool_name,
-            description,
-            json.dumps(json_schema),
-            tool_type,
-            internal_api_path,
-            True
-        ))
-        
-        self.conn.commit()
+        """, rows, page_size=500)
+    
+    def create_tool(self, tool_id: str, tool_name: str, description: str = "", 
+                   tool_type: str = "custom", internal_api_path: str = None, 
+                   json_schema: Union[Dict, str] = None) -> str:
+        """Create a new tool in the database; json_schema may be a dict or already serialized JSON text."""
+        self._bulk_upsert_tools([
+            self._build_tool_row(tool_id, tool_name, description, tool_type, internal_api_path, json_schema)
+        ])
         return tool_id
     
     def update_tool(self, tool_id: str, tool_name: str = None, description: str = None,
                    tool_type: str = None, internal_api_path: str = None, 
-                   json_schema: Dict = None) -> bool:
-        """Update an existing tool."""
-        # Build dynamic update query
-        updates = []
-        params = []
-        
-        if tool_name is not None:
-            updates.append('tool_name = %s')
-            params.append(tool_name)
-
-        if description is not None:
-            updates.append('description_for_llm = %s')
-            params.append(description)
-
-        if tool_type is not None:
-            updates.append('tool_type = %s')
-            params.append(tool_type)
-
-        if internal_api_path is not None:
-            updates.append('internal_api_path = %s')
-            params.append(internal_api_path)
-
-        if json_schema is not None:
-            updates.append('json_schema = %s')
-            params.append(json.dumps(json_schema))
-
-        if not updates:
+                   json_schema: Union[Dict, str] = None) -> bool:
+        """Update an existing tool; fields left as None keep their stored value."""
+        fields = (tool_name, description, tool_type, internal_api_path, json_schema)
+        if all(field is None for field in fields):
             return False
 
-        updates.append('updated_at = NOW()')
-        params.append(tool_id)
-
-        query = f"""
-            UPDATE system_tool
-            SET {', '.join(updates)}
-            WHERE id = %s
-        """
-        
-        self.cursor.execute(query, params)
-        self.conn.commit()
+        # One constant statement, so it is prepared once instead of built per combination of fields
+        self._execute_prepared("tool_update", (
+            tool_name,
+            description,
+            tool_type,
+            internal_api_path,
+            self._schema_param(json_schema) if json_schema is not None else None,
+            tool_id
+        ))
         
         return self.cursor.rowcount > 0
     
     def delete_tool(self, tool_id: str, force: bool = False) -> bool:
         """Delete a tool from the database."""
-        # Check for associations
         agent_tool_table = self._get_agent_tool_table_name(Scope.SYSTEM)
 
+        # Count, remove the associations and delete the tool in one round trip; unless forced, nothing
+        # is deleted while associations exist. Foreign keys are checked at the end of the statement.
         self.cursor.execute(f"""
-            SELECT COUNT(*) as count FROM {agent_tool_table} WHERE tool_id = %s
-        """, (tool_id,))
-        association_count = self.cursor.fetchone()['count']
-
-        if association_count > 0 and not force:
-            raise ValueError(f"Cannot delete tool {tool_id}: it is associated with {association_count} agents. Use --force to override.")
-
-        # Remove all associations first
-        self.cursor.execute(f'DELETE FROM {agent_tool_table} WHERE tool_id = %s', (tool_id,))
+            WITH association_count AS (
+                SELECT COUNT(*) AS count FROM {agent_tool_table} WHERE tool_id = %(tool_id)s
+            ),
+            allowed AS (
+                SELECT %(force)s OR count = 0 AS ok FROM association_count
+            ),
+            removed_associations AS (
+                DELETE FROM {agent_tool_table}
+                WHERE tool_id = %(tool_id)s AND (SELECT ok FROM allowed)
+            ),
+            deleted_tool AS (
+                DELETE FROM system_tool
+                WHERE id = %(tool_id)s AND (SELECT ok FROM allowed)
+                RETURNING id
+            )
+            SELECT (SELECT count FROM association_count) AS association_count,
+                   (SELECT COUNT(*) FROM deleted_tool) AS deleted_count
+        """, {"tool_id": tool_id, "force": force})
+        result = self.cursor.fetchone()
 
-        # Delete the tool
-        self.cursor.execute("DELETE FROM system_tool WHERE id = %s", (tool_id,))
+        if not force and result['association_count'] > 0:
+            raise ValueError(f"Cannot delete tool {tool_id}: it is associated with {result['association_count']} agents. Use --force to override.")
 
-        self.conn.commit()
-        return self.cursor.rowcount > 0
+        return result['deleted_count'] > 0
 
     def get_tool(self, tool_id: str) -> Optional[Dict]:
         """Get a tool by ID."""
-        self.cursor.execute("SELECT * FROM system_tool WHERE id = %s", (tool_id,))
-        result = self.cursor.fetchone()
-        return dict(result) if result else None
+        self._execute_prepared("tool_get", (tool_id,))
+        return self.cursor.fetchone()
 
     def list_tools(self) -> List[Dict]:
         """List all tools."""
         self.cursor.execute('SELECT * FROM system_tool ORDER BY tool_name')
-        return [dict(row) for row in self.cursor.fetchall()]
+        return self.cursor.fetchall()
 
     def get_agent_tools(self, agent_id: str, scope: Scope) -> List[Dict]:
         """Get all tools associated with an agent."""
-        agent_tool_table = self._get_agent_tool_table_name(scope)
-        self.cursor.execute(f"""
-            SELECT t.* FROM system_tool t
-            JOIN {agent_tool_table} at ON t.id = at.tool_id
-            WHERE at.agent_id = %s
-            ORDER BY t.tool_name
-        """, (agent_id,))
-        return [dict(row) for row in self.cursor.fetchall()]
+        self._execute_prepared("agent_tools_get", (agent_id,), scope)
+        return self.cursor.fetchall()
     
     def associate_tool_with_agent(self, agent_id: str, tool_id: str, scope: Scope) -> bool:
         """Associate a tool with an agent."""
-        agent_tool_table = self._get_agent_tool_table_name(scope)
-
         # Verify tool exists
         if not self.get_tool(tool_id):
             raise ValueError(f"Tool {tool_id} not found")
 
         # Create association (no id column - composite PK)
-        self.cursor.execute(f"""
-            INSERT INTO {agent_tool_table} (agent_id, tool_id)
-            VALUES (%s, %s)
-            ON CONFLICT (agent_id, tool_id) DO NOTHING
-        """, (agent_id, tool_id))
+        self._execute_prepared("agent_tool_insert", (agent_id, tool_id), scope)
 
-        self.conn.commit()
         return True
 
+    def _associate_tools_bulk(self, agent_id: str, tool_ids: Set[str], scope: Scope) -> int:
+        """Associate several existing tools with an agent in one statement; returns how many were given."""
+        if not tool_ids:
+            return 0
+        
+        execute_values(self.cursor, f"""
+            INSERT INTO {self._get_agent_tool_table_name(scope)} (agent_id, tool_id)
+            VALUES %s
+            ON CONFLICT (agent_id, tool_id) DO NOTHING
+        """, [(agent_id, tool_id) for tool_id in tool_ids], page_size=500)
+        return len(tool_ids)
+
     def disassociate_tool_from_agent(self, agent_id: str, tool_id: str, scope: Scope) -> bool:
         """Remove a tool association from an agent."""
-        agent_tool_table = self._get_agent_tool_table_name(scope)
-        self.cursor.execute(f"""
-            DELETE FROM {agent_tool_table}
-            WHERE agent_id = %s AND tool_id = %s
-        """, (agent_id, tool_id))
+        self._execute_prepared("agent_tool_delete", (agent_id, tool_id), scope)
 
-        self.conn.commit()
         return self.cursor.rowcount > 0
     
-    def sync_agent_tools(self, agent_id: str, tools: List[Dict], scope: Scope) -> Dict[str, int]:
-        """Sync tool associations for an agent with proper cleanup."""
+    def get_agent_tool_ids(self, agent_ids: List[str], scope: Scope) -> Dict[str, Set[str]]:
+        """Get the associated tool IDs for several agents in one query, keyed by agent ID."""
         agent_tool_table = self._get_agent_tool_table_name(scope)
         
-        # Get current tool associations
+        # Map canonical UUID text back to the IDs as given; invalid IDs are left to fail in their own sync
+        requested = {}
+        for agent_id in agent_ids:
+            try:
+                requested[str(uuid.UUID(agent_id))] = agent_id
+            except ValueError:
+                continue
+        
         self.cursor.execute(f"""
-            SELECT tool_id FROM {agent_tool_table} WHERE agent_id = %s
-        """, (agent_id,))
-        current_tool_ids = {str(row['tool_id']) for row in self.cursor.fetchall()}
+            SELECT agent_id, tool_id FROM {agent_tool_table} WHERE agent_id = ANY(%s::uuid[])
+        """, (list(requested),))
+        
+        tool_ids = defaultdict(set)
+        for row in self.cursor.fetchall():
+            tool_ids[requested[str(row['agent_id'])]].add(str(row['tool_id']))
+        return tool_ids
+    
+    def sync_agent_tools(self, agent_id: str, tools: List[Dict], scope: Scope,
+                         current_tool_ids: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """Sync tool associations for an agent with proper cleanup."""
+        agent_tool_table = self._get_agent_tool_table_name(scope)
         
-        # Process new tools
-        new_tool_ids = set()
-        created_count = 0
-        updated_count = 0
+        # Get current tool associations unless the caller prefetched them
+        if current_tool_ids is None:
+            self.cursor.execute(f"""
+                SELECT tool_id FROM {agent_tool_table} WHERE agent_id = %s
+            """, (agent_id,))
+            current_tool_ids = {str(row['tool_id']) for row in self.cursor.fetchall()}
+        
+        # Collect the _build_tool_row arguments per valid tool; a repeated toolId keeps its last definition.
+        # Tools whose toolId is not a UUID are reported and left out of the batch so the rest still sync
+        tool_values = {}
+        requested = {}  # canonical UUID text -> toolId as given
+        failed = []
         
         for tool_data in tools:
             tool_id = tool_data.get('toolId')
@@ -204,73 +291,97 @@ class ToolManager:
                 continue
             
             tool_function = tool_data.get('function', {})
-            tool_name = tool_function.get('name', f"tool_{tool_id[:8]}")
-            
             try:
-                self.create_tool(
-                    tool_id=tool_id,
-                    tool_name=tool_name,
-                    description=tool_function.get('description', ''),
-                    tool_type=tool_data.get('type', 'custom'),
-                    json_schema=tool_data
-                )
-                new_tool_ids.add(tool_id)
-                
-            except Exception as e:
+                canonical_id = str(uuid.UUID(tool_id))
+            except (ValueError, TypeError, AttributeError) as e:
                 print(f"Warning: Failed to process tool {tool_id}: {str(e)}")
+                failed.append(f"{tool_id} - {str(e)}")
                 continue
+            
+            requested[canonical_id] = tool_id
+            tool_values[tool_id] = (
+                tool_function.get('name', f"tool_{tool_id[:8]}"),
+                tool_function.get('description', ''),
+                tool_data.get('type', 'custom'),
+                None,
+                tool_data
+            )
+        
+        # Skip tools whose stored row already matches
+        existing = {}
+        if requested:
+            self.cursor.execute("""
+                SELECT id, tool_name, description_for_llm, json_schema, tool_type, internal_api_path
+                FROM system_tool WHERE id = ANY(%s::uuid[])
+            """, (list(requested),))
+            for row in self.cursor.fetchall():
+                existing[requested[str(row['id'])]] = (
+                    row['tool_name'], row['description_for_llm'], row['tool_type'],
+                    row['internal_api_path'], row['json_schema']
+                )
+        
+        changed_ids = [tool_id for tool_id, values in tool_values.items() if existing.get(tool_id) != values]
+        created_count = sum(1 for tool_id in changed_ids if tool_id not in existing)
+        updated_count = len(changed_ids) - created_count
         
-        # Remove old associations
+        # Upsert the new and changed tools in one statement
+        if changed_ids:
+            self._bulk_upsert_tools([self._build_tool_row(tool_id, *tool_values[tool_id]) for tool_id in changed_ids])
+        new_tool_ids = set(tool_values)
+        
+        # Remove old associations in one statement
         tools_to_remove = current_tool_ids - new_tool_ids
         removed_count = 0
-        for tool_id in tools_to_remove:
-            if self.disassociate_tool_from_agent(agent_id, tool_id, scope):
-                removed_count += 1
+        if tools_to_remove:
+            self.cursor.execute(f"""
+                DELETE FROM {agent_tool_table}
+                WHERE agent_id = %s AND tool_id = ANY(%s::uuid[])
+            """, (agent_id, list(tools_to_remove)))
+            removed_count = self.cursor.rowcount
         
-        # Add new associations
-        added_count = 0
-        for tool_id in new_tool_ids:
-            if tool_id not in current_tool_ids:
-                if self.associate_tool_with_agent(agent_id, tool_id, scope):
-                    added_count += 1
+        # Add new associations in one statement; the tools were just upserted, so no existence check
+        tools_to_add = new_tool_ids - current_tool_ids
+        added_count = self._associate_tools_bulk(agent_id, tools_to_add, scope)
         
         return {
             "created": created_count,
             "updated": updated_count,
             "added": added_count,
-            "removed": removed_count
+            "removed": removed_count,
+            "failed": failed
         }
 
     def find_orphaned_tools(self) -> List[Dict]:
         """Find tools that are not associated with any agents."""
         agent_tool_table = self._get_agent_tool_table_name(Scope.SYSTEM)
 
+        # Anti-join on the tool_id index from database_indexes
         self.cursor.execute(f"""
             SELECT t.* FROM system_tool t
-            LEFT JOIN {agent_tool_table} at ON t.id = at.tool_id
-            WHERE at.tool_id IS NULL
+            WHERE NOT EXISTS (SELECT 1 FROM {agent_tool_table} at WHERE at.tool_id = t.id)
             ORDER BY t.tool_name
         """)
 
-        return [dict(row) for row in self.cursor.fetchall()]
+        return self.cursor.fetchall()
 
     def cleanup_orphaned_tools(self, force: bool = False) -> int:
         """Remove tools that are not associated with any agents."""
+        if force:
+            # Orphans have no associations to remove: delete them all in one statement
+            agent_tool_table = self._get_agent_tool_table_name(Scope.SYSTEM)
+            self.cursor.execute(f"""
+                DELETE FROM system_tool t
+                WHERE NOT EXISTS (SELECT 1 FROM {agent_tool_table} at WHERE at.tool_id = t.id)
+            """)
+            return self.cursor.rowcount
+        
         orphaned_tools = self.find_orphaned_tools()
         
         if not orphaned_tools:
             return 0
         
-        if not force:
-            print(f"Found {len(orphaned_tools)} orphaned tools:")
-            for tool in orphaned_tools:
-                print(f"  - {tool['tool_name']} (ID: {tool['id']})")
-            print("Run with --force to delete them.")
-            return 0
-        
-        deleted_count = 0
+        print(f"Found {len(orphaned_tools)} orphaned tools:")
         for tool in orphaned_tools:
-            if self.delete_tool(tool['id'], force=True):
-                deleted_count += 1
-        
-        return deleted_count
\ No newline at end of file
+            print(f"  - {tool['tool_name']} (ID: {tool['id']})")
+        print("Run with --force to delete them.")
+        return 0
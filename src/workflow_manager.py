@@ -3,22 +3,98 @@ Workflow management functionality for the cc Agents system.
 Handles creation, syncing, and management of agentic workflows with dual scope support.
 """
 
+import io
 import os
-import json
 import uuid
-from typing import Dict, List, Optional, Tuple
-from .config import get_db_connection, get_db_cursor, Scope, ResourceType, get_definitions_path, ensure_directory_exists
+import hashlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from .config import get_db_connection, release_db_connection, get_db_cursor, get_database_key, prepare_statements, Scope, ResourceType, get_definitions_path, ensure_directory_exists, load_json_file, dump_json_file, json_loads, json_dumps
+
+# Characters COPY's text format needs escaped inside a field
+COPY_TEXT_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
 
 class WorkflowManager:
     """Manages workflow operations including creation, syncing, and database operations."""
     
-    def __init__(self):
-        self.conn = None
+    # CCRM only has system_ tables (no schema prefix, no common_background variants), so every scope
+    # maps a resource type to the same table
+    TABLE_NAMES = {
+        ResourceType.WORKFLOW: "system_agent_workflow",
+        ResourceType.WORKFLOW_NODE: "system_agent_workflow_node",
+        ResourceType.WORKFLOW_EDGE: "system_agent_workflow_edge",
+        ResourceType.AGENT: "system_agent",
+    }
+
+    # Agent checks run once per workflow or per node during a sync; prepared once per session and
+    # run with EXECUTE so the server does not re-parse and re-plan them every time
+    PREPARED_STATEMENTS = {
+        "workflow_agent_exists": "SELECT id FROM system_agent WHERE id = $1",
+        "workflow_missing_agents": """
+            SELECT agent_id FROM unnest($1::text[]) AS agent_id
+            WHERE NOT EXISTS (SELECT 1 FROM system_agent a WHERE a.id = agent_id::uuid)
+        """,
+    }
+
+    # Workflow, node and edge upserts. {rows} is pre-rendered VALUES rows in the single statement sync,
+    # or a SELECT from the COPY staging tables in the bulk sync
+    WORKFLOW_UPSERT_SQL = """
+        INSERT INTO {table} AS w
+        (id, name, description, entrypoint_node_id, is_conversational)
+        {rows}
+        ON CONFLICT (id) DO UPDATE SET
+            name = EXCLUDED.name,
+            description = EXCLUDED.description,
+            entrypoint_node_id = COALESCE(EXCLUDED.entrypoint_node_id, w.entrypoint_node_id),
+            is_conversational = EXCLUDED.is_conversational,
+            updated_at = NOW()
+    """
+    NODE_UPSERT_SQL = """
+        INSERT INTO {table} AS n
+        (id, workflow_id, agent_id, node_type, node_name)
+        {rows}
+        ON CONFLICT (id) DO UPDATE SET
+            workflow_id = EXCLUDED.workflow_id,
+            agent_id = EXCLUDED.agent_id,
+            node_type = EXCLUDED.node_type,
+            node_name = EXCLUDED.node_name
+        WHERE (n.workflow_id, n.agent_id, n.node_type, n.node_name)
+            IS DISTINCT FROM (EXCLUDED.workflow_id, EXCLUDED.agent_id, EXCLUDED.node_type, EXCLUDED.node_name)
+    """
+    EDGE_UPSERT_SQL = """
+        INSERT INTO {table} AS e
+        (id, workflow_id, source_node_id, target_node_id, condition_type, condition_value)
+        {rows}
+        ON CONFLICT (id) DO UPDATE SET
+            workflow_id = EXCLUDED.workflow_id,
+            source_node_id = EXCLUDED.source_node_id,
+            target_node_id = EXCLUDED.target_node_id,
+            condition_type = EXCLUDED.condition_type,
+            condition_value = EXCLUDED.condition_value
+        WHERE (e.workflow_id, e.source_node_id, e.target_node_id, e.condition_type, e.condition_value)
+            IS DISTINCT FROM (EXCLUDED.workflow_id, EXCLUDED.source_node_id, EXCLUDED.target_node_id,
+                              EXCLUDED.condition_type, EXCLUDED.condition_value)
+    """
+
+    # Per-scope, per-database file in the workflow definitions directory: workflow_id -> [mtime_ns, sha256]
+    # as last synced to that database, so a sync to another database does not skip what it never received
+    SYNC_STATE_FILE = '.sync_state.{database}.json'
+    
+    def __init__(self, conn=None):
+        # A connection passed in is borrowed: the owner controls its transaction and lifetime
+        self.conn = conn
         self.cursor = None
+        self._owns_conn = conn is None
+        self._statements_prepared = False
+        # Sync state path and fingerprints per scope of the workflow files read with changed_only,
+        # saved once they are synced
+        self._file_fingerprints = {}
     
     def __enter__(self):
         """Context manager entry."""
-        self.conn = get_db_connection()
+        if self._owns_conn:
+            self.conn = get_db_connection()
         self.cursor = get_db_cursor(self.conn)
         return self
     
@@ -26,21 +102,25 @@ class WorkflowManager:
         """Context manager exit."""
         if self.cursor:
             self.cursor.close()
-        if self.conn:
-            self.conn.close()
+        if self.conn and self._owns_conn:
+            release_db_connection(self.conn)
+
+    def _commit(self):
+        """Commit, unless the connection is borrowed from a caller managing the transaction."""
+        if self._owns_conn:
+            self.conn.commit()
+
+    def _prepare_statements(self):
+        """Prepare PREPARED_STATEMENTS on first use, so commands that never sync skip the round trips."""
+        if not self._statements_prepared:
+            prepare_statements(self.conn, self.PREPARED_STATEMENTS)
+            self._statements_prepared = True
 
     def _get_table_name(self, scope: Scope, resource: ResourceType) -> str:
         """Get the correct table name based on the scope and resource type."""
-        # CCRM only has system_ tables (no schema prefix, no common_background variants)
-        if resource == ResourceType.WORKFLOW:
-            return "system_agent_workflow"
-        elif resource == ResourceType.WORKFLOW_NODE:
-            return "system_agent_workflow_node"
-        elif resource == ResourceType.WORKFLOW_EDGE:
-            return "system_agent_workflow_edge"
-        elif resource == ResourceType.AGENT:
-            return "system_agent"
-        else:
+        try:
+            return self.TABLE_NAMES[resource]
+        except KeyError:
             raise ValueError(f"Invalid resource type for table name: {resource}")
 
     def _validate_agent_exists(self, agent_id: str) -> Optional[Scope]:
@@ -48,103 +128,201 @@ class WorkflowManager:
         if not agent_id:
             return None
 
-        agent_table = self._get_table_name(Scope.SYSTEM, ResourceType.AGENT)
-
-        self.cursor.execute(f"SELECT id FROM {agent_table} WHERE id = %s", (agent_id,))
+        self._prepare_statements()
+        self.cursor.execute("EXECUTE workflow_agent_exists (%s)", (agent_id,))
         if self.cursor.fetchone():
             return Scope.SYSTEM
 
         return None
-    
-    def sync_workflow_to_db(self, workflow_id: str, scope: Scope) -> str:
-        """Sync a single workflow from local files to database using a literal 1-to-1 mapping."""
-        workflow_dir = os.path.join(get_definitions_path(scope, ResourceType.WORKFLOW), workflow_id)
 
+    def _validate_agents_exist(self, agent_ids) -> set:
+        """Return the subset of agent_ids that exist, checked in one query instead of one per agent."""
+        agent_ids = list(agent_ids)
+        if not agent_ids:
+            return set()
+
+        self._prepare_statements()
+        self.cursor.execute("EXECUTE workflow_missing_agents (%s)", (agent_ids,))
+        return set(agent_ids) - {row['agent_id'] for row in self.cursor.fetchall()}
+    
+    @staticmethod
+    def _read_workflow_file(workflow_dir: str) -> Dict:
+        """Read a workflow's workflow.json."""
         if not os.path.exists(workflow_dir):
             raise FileNotFoundError(f"Workflow directory not found: {workflow_dir}")
 
-        with open(os.path.join(workflow_dir, 'workflow.json'), 'r') as f:
-            workflow_data = json.load(f)
+        return load_json_file(os.path.join(workflow_dir, 'workflow.json'))
 
-        workflow_table = self._get_table_name(scope, ResourceType.WORKFLOW)
-        entrypoint_node_id = workflow_data.get('entrypointNodeId')
+    def read_all_workflow_files(self, scope: Optional[Scope] = None,
+                                changed_only: bool = False) -> Dict[Scope, List[Tuple[str, object]]]:
+        """Read every workflow.json per scope without touching the database.
 
-        # Step 1: Insert/update workflow WITHOUT entrypoint_node_id to avoid FK constraint violation
-        self.cursor.execute(f"""
-            INSERT INTO {workflow_table}
-            (id, name, description, entrypoint_node_id, is_conversational)
-            VALUES (%s, %s, %s, NULL, %s)
-            ON CONFLICT (id) DO UPDATE SET
-                name = EXCLUDED.name,
-                description = EXCLUDED.description,
-                is_conversational = EXCLUDED.is_conversational,
-                updated_at = NOW()
-        """, (
-            workflow_data['id'],
-            workflow_data['name'],
-            workflow_data.get('description', ''),
-            workflow_data.get('isConversational', False)
-        ))
+        Each entry is (workflow_id, data) where data is the parsed workflow or the exception raised
+        reading it, so this can run on another thread while the database is busy. With changed_only,
+        workflows whose file matches the scope's sync state (same mtime, or same content) are left out.
+        """
+        workflow_files = {}
+        scopes_to_process = [scope] if scope else [Scope.SYSTEM, Scope.COMMON_BACKGROUND]
 
-        # Step 2: Sync nodes (now they can be created)
-        self._sync_workflow_nodes(workflow_id, workflow_data.get('nodes', []), scope)
+        for current_scope in scopes_to_process:
+            definitions_path = get_definitions_path(current_scope, ResourceType.WORKFLOW)
 
-        # Step 3: Sync edges
-        self._sync_workflow_edges(workflow_id, workflow_data.get('edges', []), scope)
+            if not os.path.exists(definitions_path):
+                continue
 
-        # Step 4: Update workflow with entrypoint_node_id now that nodes exist
-        if entrypoint_node_id:
-            self.cursor.execute(f"""
-                UPDATE {workflow_table}
-                SET entrypoint_node_id = %s, updated_at = NOW()
-                WHERE id = %s
-            """, (entrypoint_node_id, workflow_id))
+            with os.scandir(definitions_path) as dir_entries:
+                workflow_dirs = [(entry.name, entry.path) for entry in dir_entries if entry.is_dir()]
 
-        self.conn.commit()
+            entries = []
+            if changed_only:
+                state_path = os.path.join(definitions_path, self.SYNC_STATE_FILE.format(database=get_database_key()))
+                state = self._load_sync_state(state_path)
+                fingerprints = {}
+                self._file_fingerprints[current_scope] = (state_path, fingerprints)
+                for workflow_id, workflow_dir in workflow_dirs:
+                    try:
+                        data = self._read_changed_workflow_file(workflow_dir, state.get(workflow_id), fingerprints, workflow_id)
+                    except Exception as e:
+                        data = e
+                    if data is not None:
+                        entries.append((workflow_id, data))
+            else:
+                for workflow_id, workflow_dir in workflow_dirs:
+                    try:
+                        entries.append((workflow_id, self._read_workflow_file(workflow_dir)))
+                    except Exception as e:
+                        entries.append((workflow_id, e))
+            workflow_files[current_scope] = entries
+
+        return workflow_files
+
+    @staticmethod
+    def _read_changed_workflow_file(workflow_dir: str, synced: Optional[List], fingerprints: Dict[str, List],
+                                    workflow_id: str) -> Optional[Dict]:
+        """Parse a workflow.json unless it matches its synced fingerprint; records the file's fingerprint."""
+        path = os.path.join(workflow_dir, 'workflow.json')
+        mtime_ns = os.stat(path).st_mtime_ns
+        if synced and synced[0] == mtime_ns:
+            fingerprints[workflow_id] = synced
+            return None
+
+        with open(path, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        fingerprints[workflow_id] = [mtime_ns, digest]
+        if synced and synced[1] == digest:
+            return None  # Touched but not changed
+        return json_loads(content)
+
+    @staticmethod
+    def _load_sync_state(state_path: str) -> Dict[str, List]:
+        """The scope's sync state, or an empty one when it has never been saved or can't be read."""
+        try:
+            return load_json_file(state_path)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_sync_state(self, failed: Set[Tuple[Scope, str]]):
+        """Record the fingerprints of the files read with changed_only, except the (scope, workflow_id) that failed."""
+        for current_scope, (state_path, fingerprints) in self._file_fingerprints.items():
+            state = {
+                workflow_id: fingerprint for workflow_id, fingerprint in fingerprints.items()
+                if (current_scope, workflow_id) not in failed
+            }
+            dump_json_file(state_path, state)
+        self._file_fingerprints = {}
+
+    def sync_workflow_to_db(self, workflow_id: str, scope: Scope, workflow_data: Optional[Dict] = None,
+                            commit: bool = True) -> str:
+        """Sync a single workflow from local files to database using a literal 1-to-1 mapping."""
+        # Read the file unless the caller already loaded it
+        if workflow_data is None:
+            workflow_dir = os.path.join(get_definitions_path(scope, ResourceType.WORKFLOW), workflow_id)
+            workflow_data = self._read_workflow_file(workflow_dir)
+
+        # The workflow, its nodes and its edges are written in one round trip
+        self._check_workflow_agents(workflow_id, workflow_data.get('nodes', []))
+        self.cursor.execute(self._build_sync_statement(workflow_id, workflow_data, scope))
+        if commit:
+            self._commit()
         return workflow_id
-    
-    def _sync_workflow_nodes(self, workflow_id: str, nodes: List[Dict], scope: Scope):
-        """Sync workflow nodes to database with agent validation."""
+
+    def _build_sync_statement(self, workflow_id: str, workflow_data: Dict, scope: Scope) -> str:
+        """Render the whole workflow sync as one statement of data-modifying CTEs.
+
+        Foreign keys are checked at the end of the statement, so the workflow can point at its
+        entrypoint and edges at their nodes even though all of them are written together.
+        """
+        workflow_table = self._get_table_name(scope, ResourceType.WORKFLOW)
         node_table = self._get_table_name(scope, ResourceType.WORKFLOW_NODE)
-        self.cursor.execute(f'DELETE FROM {node_table} WHERE workflow_id = %s', (workflow_id,))
-        
-        for node in nodes:
-            agent_id = node.get('agentId')
-            
-            if agent_id and not self._validate_agent_exists(agent_id):
-                raise ValueError(f"Agent {agent_id} referenced in workflow {workflow_id} does not exist in any scope")
-            
-            self.cursor.execute(f"""
-                INSERT INTO {node_table}
-                (id, workflow_id, agent_id, node_type, node_name)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                node['id'],
-                workflow_id,
-                agent_id,
-                node['nodeType'],
-                node['nodeName']
-            ))
-    
-    def _sync_workflow_edges(self, workflow_id: str, edges: List[Dict], scope: Scope):
-        """Sync workflow edges to database."""
         edge_table = self._get_table_name(scope, ResourceType.WORKFLOW_EDGE)
-        self.cursor.execute(f'DELETE FROM {edge_table} WHERE workflow_id = %s', (workflow_id,))
-        
-        for edge in edges:
-            self.cursor.execute(f"""
-                INSERT INTO {edge_table}
-                (id, workflow_id, source_node_id, target_node_id, condition_type, condition_value)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
+        node_rows = self._node_rows(workflow_id, workflow_data.get('nodes', []))
+        edge_rows = self._edge_rows(workflow_id, workflow_data.get('edges', []))
+
+        render = self._render
+
+        # An omitted entrypoint keeps the stored one
+        values = render("(%s, %s, %s, %s, %s)", self._workflow_row(workflow_data))
+        ctes = [f"workflow_upsert AS ({self.WORKFLOW_UPSERT_SQL.format(table=workflow_table, rows='VALUES ' + values)})"]
+        if node_rows:
+            values = ", ".join(render("(%s, %s, %s, %s, %s)", row) for row in node_rows)
+            ctes.append(f"nodes_upsert AS ({self.NODE_UPSERT_SQL.format(table=node_table, rows='VALUES ' + values)})")
+        ctes.append(render(f"nodes_delete_stale AS (DELETE FROM {node_table} WHERE workflow_id = %s AND id <> ALL(%s::uuid[]))",
+                           (workflow_id, [row[0] for row in node_rows])))
+        if edge_rows:
+            values = ", ".join(render("(%s, %s, %s, %s, %s, %s)", row) for row in edge_rows)
+            ctes.append(f"edges_upsert AS ({self.EDGE_UPSERT_SQL.format(table=edge_table, rows='VALUES ' + values)})")
+        ctes.append(render(f"edges_delete_stale AS (DELETE FROM {edge_table} WHERE workflow_id = %s AND id <> ALL(%s::uuid[]))",
+                           (workflow_id, [row[0] for row in edge_rows])))
+
+        return "WITH " + ",\n".join(ctes) + "\nSELECT 1"
+
+    def _render(self, sql: str, params: tuple) -> str:
+        """Bind params into sql client-side, for statements assembled from several parts."""
+        return self.cursor.mogrify(sql, params).decode()
+
+    @staticmethod
+    def _workflow_row(workflow_data: Dict) -> tuple:
+        """Workflow column values in WORKFLOW_UPSERT_SQL order."""
+        return (
+            workflow_data['id'],
+            workflow_data['name'],
+            workflow_data.get('description', ''),
+            workflow_data.get('entrypointNodeId'),
+            workflow_data.get('isConversational', False)
+        )
+
+    @staticmethod
+    def _node_rows(workflow_id: str, nodes: List[Dict]) -> List[tuple]:
+        """Node column values in NODE_UPSERT_SQL order."""
+        return [
+            (node['id'], workflow_id, node.get('agentId'), node['nodeType'], node['nodeName'])
+            for node in nodes
+        ]
+
+    @staticmethod
+    def _edge_rows(workflow_id: str, edges: List[Dict]) -> List[tuple]:
+        """Edge column values in EDGE_UPSERT_SQL order."""
+        return [
+            (
                 edge['id'],
                 workflow_id,
                 edge['sourceNodeId'],
                 edge.get('targetNodeId'),
                 edge['conditionType'],
                 edge.get('conditionValue')
-            ))
+            )
+            for edge in edges
+        ]
 
+    def _check_workflow_agents(self, workflow_id: str, nodes: List[Dict]):
+        """Raise for the first node whose agent does not exist, checking all of them in one query."""
+        agent_ids = list(dict.fromkeys(node['agentId'] for node in nodes if node.get('agentId')))
+        existing = self._validate_agents_exist(agent_ids)
+        for agent_id in agent_ids:
+            if agent_id not in existing:
+                raise ValueError(f"Agent {agent_id} referenced in workflow {workflow_id} does not exist in any scope")
+    
     def sync_workflow_from_db(self, workflow_id: str, scope: Scope) -> str:
         """Sync a single workflow from database to local files."""
         workflow_table = self._get_table_name(scope, ResourceType.WORKFLOW)
@@ -157,10 +335,10 @@ class WorkflowManager:
             raise ValueError(f"Workflow {workflow_id} not found in database with scope {scope.value}")
         
         self.cursor.execute(f'SELECT * FROM {node_table} WHERE workflow_id = %s', (workflow_id,))
-        nodes = [dict(row) for row in self.cursor.fetchall()]
+        nodes = self.cursor.fetchall()
 
         self.cursor.execute(f'SELECT * FROM {edge_table} WHERE workflow_id = %s', (workflow_id,))
-        edges = [dict(row) for row in self.cursor.fetchall()]
+        edges = self.cursor.fetchall()
         
         workflow_dir = os.path.join(get_definitions_path(scope, ResourceType.WORKFLOW), workflow_id)
         ensure_directory_exists(workflow_dir)
@@ -170,54 +348,42 @@ class WorkflowManager:
             "name": workflow['name'],
             "description": workflow.get('description', ''),
             "scope": scope.value,
-            "isConversational": workflow.get('isConversational', False),
+            "isConversational": workflow.get('is_conversational', False),
             "entrypointNodeId": workflow.get('entrypoint_node_id'),
             "nodes": [
                 {
                     "id": node['id'],
-                    "workflowId": node['workflowId'],
-                    "nodeType": node['nodeType'],
-                    "nodeName": node['nodeName'],
-                    "agentId": node.get('agentId')
+                    "workflowId": node['workflow_id'],
+                    "nodeType": node['node_type'],
+                    "nodeName": node['node_name'],
+                    "agentId": node.get('agent_id')
                 }
                 for node in nodes
             ],
             "edges": [
                 {
                     "id": edge['id'],
-                    "workflowId": edge['workflowId'],
-                    "sourceNodeId": edge['sourceNodeId'],
-                    "targetNodeId": edge.get('targetNodeId'),
-                    "conditionType": edge['conditionType'],
-                    "conditionValue": edge.get('conditionValue')
+                    "workflowId": edge['workflow_id'],
+                    "sourceNodeId": edge['source_node_id'],
+                    "targetNodeId": edge.get('target_node_id'),
+                    "conditionType": edge['condition_type'],
+                    "conditionValue": edge.get('condition_value')
                 }
                 for edge in edges
             ]
         }
         
-        with open(os.path.join(workflow_dir, 'workflow.json'), 'w') as f:
-            json.dump(workflow_data, f, indent=2)
+        dump_json_file(os.path.join(workflow_dir, 'workflow.json'), workflow_data)
         
         return workflow_id
 
     def list_workflows(self, scope: Optional[Scope] = None) -> List[Dict]:
         """List all workflows, optionally filtered by scope."""
-        if scope:
-            table_name = self._get_table_name(scope, ResourceType.WORKFLOW)
-            query = f"SELECT *, '{scope.value}' as scope FROM {table_name} ORDER BY name"
-            self.cursor.execute(query)
-        else:
-            system_table = self._get_table_name(Scope.SYSTEM, ResourceType.WORKFLOW)
-            common_table = self._get_table_name(Scope.COMMON_BACKGROUND, ResourceType.WORKFLOW)
-            query = f"""
-                SELECT *, 'SYSTEM' as scope FROM {system_table}
-                UNION ALL
-                SELECT *, 'COMMON_BACKGROUND' as scope FROM {common_table}
-                ORDER BY name
-            """
-            self.cursor.execute(query)
-            
-        return [dict(row) for row in self.cursor.fetchall()]
+        # CCRM only has system_ tables, so every scope reads the same table: no UNION across scopes
+        table_name = self._get_table_name(scope or Scope.SYSTEM, ResourceType.WORKFLOW)
+        scope_value = scope.value if scope else Scope.SYSTEM.value
+        self.cursor.execute(f"SELECT *, '{scope_value}' as scope FROM {table_name} ORDER BY name")
+        return self.cursor.fetchall()
 
     def delete_workflow(self, workflow_id: str, scope: Scope) -> bool:
         """Delete a workflow from both database and local files."""
@@ -233,73 +399,210 @@ class WorkflowManager:
             import shutil
             shutil.rmtree(workflow_dir)
         
-        self.conn.commit()
+        self._commit()
         return True
 
-    def sync_all_workflows(self, scope: Optional[Scope] = None) -> Dict[str, List[str]]:
-        """Sync all workflows from local files to database."""
+    def sync_all_workflows(self, scope: Optional[Scope] = None,
+                           workflow_files: Optional[Dict[Scope, List[Tuple[str, object]]]] = None,
+                           bulk: bool = False, max_workers: int = 8, changed_only: bool = False) -> Dict[str, List[str]]:
+        """Sync all workflows from local files to database; bulk loads each scope through COPY in one go.
+
+        With its own connection the manager syncs workflows on max_workers threads, each committing on a
+        pooled connection of its own. A borrowed connection keeps them serial in the caller's transaction.
+        changed_only skips workflows whose file is unchanged since the last changed_only sync.
+        """
         results = {"success": [], "errors": []}
+        # (scope, workflow_id) of every workflow that failed, kept out of the sync state
+        failed = set()
         
-        scopes_to_process = [scope] if scope else [Scope.SYSTEM, Scope.COMMON_BACKGROUND]
+        # Use files prefetched by read_all_workflow_files when given
+        if workflow_files is None:
+            workflow_files = self.read_all_workflow_files(scope, changed_only)
         
-        for current_scope in scopes_to_process:
-            definitions_path = get_definitions_path(current_scope, ResourceType.WORKFLOW)
-            
-            if not os.path.exists(definitions_path):
+        for current_scope, entries in workflow_files.items():
+            if bulk:
+                self._bulk_sync_workflows(current_scope, entries, results, failed)
                 continue
             
-            for workflow_id in os.listdir(definitions_path):
-                workflow_dir = os.path.join(definitions_path, workflow_id)
-                if os.path.isdir(workflow_dir):
-                    try:
-                        synced_id = self.sync_workflow_to_db(workflow_id, current_scope)
-                        results["success"].append(f"{current_scope.value}:{workflow_id} (ID: {synced_id})")
-                    except Exception as e:
-                        results["errors"].append(f"{current_scope.value}:{workflow_id} - {str(e)}")
-        
+            readable = []
+            for workflow_id, workflow_data in entries:
+                if isinstance(workflow_data, Exception):
+                    results["errors"].append(f"{current_scope.value}:{workflow_id} - {str(workflow_data)}")
+                    failed.add((current_scope, workflow_id))
+                else:
+                    readable.append((workflow_id, current_scope, workflow_data))
+            
+            if self._owns_conn and max_workers > 1 and len(readable) > 1:
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    outcomes = list(executor.map(self._sync_workflow_on_own_connection, *zip(*readable)))
+            else:
+                outcomes = [self._sync_workflow_in_savepoint(*args) for args in readable]
+            
+            for (workflow_id, _, _), error in zip(readable, outcomes):
+                if error is None:
+                    results["success"].append(f"{current_scope.value}:{workflow_id} (ID: {workflow_id})")
+                else:
+                    results["errors"].append(f"{current_scope.value}:{workflow_id} - {str(error)}")
+                    failed.add((current_scope, workflow_id))
+        
+        # One commit for the whole run instead of one per workflow
+        self._commit()
+        if self._file_fingerprints:
+            self._save_sync_state(failed)
         return results
+
+    def _sync_workflow_in_savepoint(self, workflow_id: str, scope: Scope, workflow_data: Dict) -> Optional[Exception]:
+        """Sync one workflow in the current transaction; returns the error, if any, instead of raising."""
+        # A savepoint keeps one failing workflow from aborting a shared transaction
+        self.cursor.execute("SAVEPOINT sync_workflow")
+        try:
+            self.sync_workflow_to_db(workflow_id, scope, workflow_data, commit=False)
+            self.cursor.execute("RELEASE SAVEPOINT sync_workflow")
+        except Exception as e:
+            self.cursor.execute("ROLLBACK TO SAVEPOINT sync_workflow")
+            return e
+        return None
+
+    @staticmethod
+    def _sync_workflow_on_own_connection(workflow_id: str, scope: Scope, workflow_data: Dict) -> Optional[Exception]:
+        """Sync and commit one workflow on a pooled connection of its own; returns the error, if any."""
+        try:
+            with WorkflowManager() as wm:
+                wm.sync_workflow_to_db(workflow_id, scope, workflow_data)
+        except Exception as e:
+            return e
+        return None
+
+    @staticmethod
+    def _copy_text(rows: Iterable[tuple]) -> io.StringIO:
+        """Rows in COPY's text format: tab separated, \\N for NULL, backslash escapes; non-str values as JSON."""
+        def field(value):
+            if value is None:
+                return '\\N'
+            if not isinstance(value, str):
+                value = json_dumps(value)
+            return value.translate(COPY_TEXT_ESCAPES)
+
+        return io.StringIO("".join("\t".join(map(field, row)) + "\n" for row in rows))
+
+    def _bulk_sync_workflows(self, scope: Scope, entries: List[Tuple[str, object]], results: Dict[str, List[str]],
+                             failed: Set[Tuple[Scope, str]]):
+        """Sync a scope's workflows at once: COPY nodes and edges into staging tables, then merge in one statement.
+
+        Every workflow in the scope succeeds or fails together; the per-workflow path isolates failures instead.
+        """
+        workflows = []
+        for workflow_id, workflow_data in entries:
+            if isinstance(workflow_data, Exception):
+                results["errors"].append(f"{scope.value}:{workflow_id} - {str(workflow_data)}")
+                failed.add((scope, workflow_id))
+            else:
+                workflows.append((workflow_id, workflow_data))
+        
+        # Check the agents of every workflow in the scope with one query
+        existing_agents = self._validate_agents_exist({
+            node['agentId'] for _, workflow_data in workflows
+            for node in workflow_data.get('nodes', []) if node.get('agentId')
+        })
+        built = []
+        for workflow_id, workflow_data in workflows:
+            missing = next((node['agentId'] for node in workflow_data.get('nodes', [])
+                            if node.get('agentId') and node['agentId'] not in existing_agents), None)
+            if missing:
+                results["errors"].append(f"{scope.value}:{workflow_id} - Agent {missing} referenced in workflow "
+                                         f"{workflow_id} does not exist in any scope")
+                failed.add((scope, workflow_id))
+            else:
+                built.append((workflow_id, workflow_data, self._node_rows(workflow_id, workflow_data.get('nodes', [])),
+                              self._edge_rows(workflow_id, workflow_data.get('edges', []))))
+        
+        # A node or edge id defined twice would be merged into one row under either workflow; fail every
+        # workflow that uses one, as the per-workflow sync fails on them
+        node_counts = Counter(row[0] for _, _, nodes, _ in built for row in nodes)
+        edge_counts = Counter(row[0] for _, _, _, edges in built for row in edges)
+        valid, node_rows, edge_rows = [], [], []
+        for workflow_id, workflow_data, nodes, edges in built:
+            duplicate = (next((f"Node {row[0]}" for row in nodes if node_counts[row[0]] > 1), None)
+                         or next((f"Edge {row[0]}" for row in edges if edge_counts[row[0]] > 1), None))
+            if duplicate:
+                results["errors"].append(f"{scope.value}:{workflow_id} - {duplicate} is defined more than once "
+                                         f"in scope {scope.value}")
+                failed.add((scope, workflow_id))
+            else:
+                valid.append((workflow_id, workflow_data))
+                node_rows.extend(nodes)
+                edge_rows.extend(edges)
+        if not valid:
+            return
+        
+        workflow_table = self._get_table_name(scope, ResourceType.WORKFLOW)
+        node_table = self._get_table_name(scope, ResourceType.WORKFLOW_NODE)
+        edge_table = self._get_table_name(scope, ResourceType.WORKFLOW_EDGE)
+        
+        self.cursor.execute("SAVEPOINT sync_workflows")
+        try:
+            # Staging tables copy the column types, enums included, and none of the constraints
+            self.cursor.execute(f"""
+                CREATE TEMP TABLE IF NOT EXISTS stg_workflow_node ON COMMIT DROP AS
+                    SELECT id, workflow_id, agent_id, node_type, node_name FROM {node_table} WITH NO DATA;
+                CREATE TEMP TABLE IF NOT EXISTS stg_workflow_edge ON COMMIT DROP AS
+                    SELECT id, workflow_id, source_node_id, target_node_id, condition_type, condition_value
+                    FROM {edge_table} WITH NO DATA;
+                TRUNCATE stg_workflow_node, stg_workflow_edge
+            """)
+            self.cursor.copy_expert("COPY stg_workflow_node FROM STDIN", self._copy_text(node_rows))
+            self.cursor.copy_expert("COPY stg_workflow_edge FROM STDIN", self._copy_text(edge_rows))
+            
+            # Foreign keys are checked at the end of the statement, as in _build_sync_statement
+            workflow_values = ", ".join(self._render("(%s, %s, %s, %s, %s)", self._workflow_row(data)) for _, data in valid)
+            workflow_ids = self._render("%s", ([workflow_id for workflow_id, _ in valid],))
+            self.cursor.execute(f"""
+                WITH workflow_upsert AS ({self.WORKFLOW_UPSERT_SQL.format(table=workflow_table, rows='VALUES ' + workflow_values)}),
+                nodes_upsert AS ({self.NODE_UPSERT_SQL.format(table=node_table, rows='SELECT * FROM stg_workflow_node')}),
+                nodes_delete_stale AS (
+                    DELETE FROM {node_table} n WHERE n.workflow_id = ANY({workflow_ids})
+                    AND NOT EXISTS (SELECT 1 FROM stg_workflow_node s WHERE s.id = n.id)
+                ),
+                edges_upsert AS ({self.EDGE_UPSERT_SQL.format(table=edge_table, rows='SELECT * FROM stg_workflow_edge')}),
+                edges_delete_stale AS (
+                    DELETE FROM {edge_table} e WHERE e.workflow_id = ANY({workflow_ids})
+                    AND NOT EXISTS (SELECT 1 FROM stg_workflow_edge s WHERE s.id = e.id)
+                )
+                SELECT 1
+            """)
+            self.cursor.execute("RELEASE SAVEPOINT sync_workflows")
+        except Exception as e:
+            self.cursor.execute("ROLLBACK TO SAVEPOINT sync_workflows")
+            results["errors"].extend(f"{scope.value}:{workflow_id} - {str(e)}" for workflow_id, _ in valid)
+            failed.update((scope, workflow_id) for workflow_id, _ in valid)
+            return
+        
+        results["success"].extend(f"{scope.value}:{workflow_id} (ID: {workflow_id})" for workflow_id, _ in valid)
     
     def get_workflow_agents(self, workflow_id: str, scope: Scope) -> List[Dict]:
         """Get all agents referenced by a workflow from any scope."""
         node_table = self._get_table_name(scope, ResourceType.WORKFLOW_NODE)
-        system_agent_table = self._get_table_name(Scope.SYSTEM, ResourceType.AGENT)
-        common_agent_table = self._get_table_name(Scope.COMMON_BACKGROUND, ResourceType.AGENT)
-        
-        query = f"""
-            WITH AllAgents AS (
-                SELECT id, name, 'SYSTEM' as scope FROM {system_agent_table}
-                UNION ALL
-                SELECT id, name, 'COMMON_BACKGROUND' as scope FROM {common_agent_table}
-            )
-            SELECT DISTINCT aa.* FROM AllAgents aa
-            JOIN {node_table} n ON aa.id = n."agentId"
-            WHERE n."workflowId" = %s AND n."agentId" IS NOT NULL
-            ORDER BY aa.name
-        """
-        self.cursor.execute(query, (workflow_id,))
-        return [dict(row) for row in self.cursor.fetchall()]
+        agent_table = self._get_table_name(Scope.SYSTEM, ResourceType.AGENT)
+        
+        self.cursor.execute(f"""
+            SELECT DISTINCT a.id, a.name, 'SYSTEM' as scope FROM {agent_table} a
+            JOIN {node_table} n ON a.id = n.agent_id
+            WHERE n.workflow_id = %s
+            ORDER BY a.name
+        """, (workflow_id,))
+        return self.cursor.fetchall()
 
     def get_agent_workflows(self, agent_id: str) -> List[Dict]:
         """Get all workflows that reference a specific agent across all scopes."""
-        system_node_table = self._get_table_name(Scope.SYSTEM, ResourceType.WORKFLOW_NODE)
-        common_node_table = self._get_table_name(Scope.COMMON_BACKGROUND, ResourceType.WORKFLOW_NODE)
-        system_workflow_table = self._get_table_name(Scope.SYSTEM, ResourceType.WORKFLOW)
-        common_workflow_table = self._get_table_name(Scope.COMMON_BACKGROUND, ResourceType.WORKFLOW)
-
-        query = f"""
-            SELECT DISTINCT w.*, 'SYSTEM' as scope 
-            FROM {system_workflow_table} w
-            JOIN {system_node_table} n ON w.id = n."workflowId"
-            WHERE n."agentId" = %s
-            UNION ALL
-            SELECT DISTINCT w.*, 'COMMON_BACKGROUND' as scope
-            FROM {common_workflow_table} w
-            JOIN {common_node_table} n ON w.id = n."workflowId"
-            WHERE n."agentId" = %s
-            ORDER BY name
-        """
-        self.cursor.execute(query, (agent_id, agent_id))
-        return [dict(row) for row in self.cursor.fetchall()]
+        node_table = self._get_table_name(Scope.SYSTEM, ResourceType.WORKFLOW_NODE)
+        workflow_table = self._get_table_name(Scope.SYSTEM, ResourceType.WORKFLOW)
+
+        self.cursor.execute(f"""
+            SELECT w.*, 'SYSTEM' as scope FROM {workflow_table} w
+            WHERE EXISTS (SELECT 1 FROM {node_table} n WHERE n.workflow_id = w.id AND n.agent_id = %s)
+            ORDER BY w.name
+        """, (agent_id,))
+        return self.cursor.fetchall()
     
     def create_workflow(self, workflow_id: str, name: str, scope: Scope, description: str = "") -> str:
         """Creates a new workflow with a single default node."""
@@ -326,8 +629,7 @@ class WorkflowManager:
             "edges": []
         }
 
-        with open(os.path.join(workflow_dir, 'workflow.json'), 'w') as f:
-            json.dump(workflow_data, f, indent=2)
+        dump_json_file(os.path.join(workflow_dir, 'workflow.json'), workflow_data)
             
         self.sync_workflow_to_db(workflow_id, scope)
         return workflow_id
@@ -345,42 +647,52 @@ class WorkflowManager:
             return {"valid": False, "errors": [f"Workflow {workflow_id} in scope {scope.value} does not exist"]}
         
         self.cursor.execute(f'SELECT * FROM {node_table} WHERE workflow_id = %s', (workflow_id,))
-        nodes = [dict(row) for row in self.cursor.fetchall()]
+        nodes = self.cursor.fetchall()
 
         self.cursor.execute(f'SELECT * FROM {edge_table} WHERE workflow_id = %s', (workflow_id,))
-        edges = [dict(row) for row in self.cursor.fetchall()]
+        edges = self.cursor.fetchall()
         
         errors = []
         warnings = []
         
+        # One pass over the nodes and one over the edges; agents are checked with a single query
+        node_ids = set()
+        needed_agents = set()
+        for node in nodes:
+            node_ids.add(node['id'])
+            if node.get('agent_id'):
+                needed_agents.add(node['agent_id'])
+        
         entrypoint_node_id = workflow.get('entrypoint_node_id')
-        if not entrypoint_node_id or not any(node['id'] == entrypoint_node_id for node in nodes):
+        if not entrypoint_node_id or entrypoint_node_id not in node_ids:
             errors.append(f"Entrypoint node {entrypoint_node_id} does not exist")
         
-        for node in nodes:
-            agent_id = node.get('agentId')
-            if agent_id and not self._validate_agent_exists(agent_id):
-                errors.append(f"Agent {agent_id} referenced by node {node['nodeName']} does not exist in any scope")
+        missing_agents = needed_agents - self._validate_agents_exist(needed_agents)
+        if missing_agents:
+            errors.extend(
+                f"Agent {node['agent_id']} referenced by node {node['node_name']} does not exist in any scope"
+                for node in nodes if node.get('agent_id') in missing_agents
+            )
         
-        node_ids = {node['id'] for node in nodes}
+        connected_nodes = set()
         for edge in edges:
-            if edge['sourceNodeId'] not in node_ids:
-                errors.append(f"Edge references non-existent source node {edge['sourceNodeId']}")
-            if edge.get('targetNodeId') and edge['targetNodeId'] not in node_ids:
-                errors.append(f"Edge references non-existent target node {edge['targetNodeId']}")
+            source_node_id = edge['source_node_id']
+            target_node_id = edge.get('target_node_id')
+            connected_nodes.add(source_node_id)
+            if source_node_id not in node_ids:
+                errors.append(f"Edge references non-existent source node {source_node_id}")
+            if target_node_id:
+                connected_nodes.add(target_node_id)
+                if target_node_id not in node_ids:
+                    errors.append(f"Edge references non-existent target node {target_node_id}")
         
-        connected_nodes = {edge['sourceNodeId'] for edge in edges}
-        for edge in edges:
-            if edge.get('targetNodeId'):
-                connected_nodes.add(edge['targetNodeId'])
-                
         orphaned_nodes = node_ids - connected_nodes - {entrypoint_node_id}
         if orphaned_nodes:
             warnings.append(f"Orphaned nodes found (unreachable from any edge): {', '.join(orphaned_nodes)}")
         
         return {
             "valid": len(errors) == 0,
-            "workflow": dict(workflow),
+            "workflow": workflow,
             "nodes": nodes,
             "edges": edges,
             "errors": errors,
@@ -404,11 +716,11 @@ class WorkflowManager:
         
         self.cursor.execute(f"""
             INSERT INTO {node_table}
-            (id, "workflowId", "agentId", "nodeType", "nodeName")
+            (id, workflow_id, agent_id, node_type, node_name)
             VALUES (%s, %s, %s, %s, %s)
         """, (node_id, workflow_id, agent_id, node_type, node_name))
         
-        self.conn.commit()
+        self._commit()
         return node_id
     
     def add_edge_to_workflow(self, workflow_id: str, source_node_id: str, scope: Scope, target_node_id: str = None,
@@ -425,9 +737,9 @@ class WorkflowManager:
         
         self.cursor.execute(f"""
             INSERT INTO {edge_table}
-            (id, "workflowId", "sourceNodeId", "targetNodeId", "conditionType", "conditionValue")
+            (id, workflow_id, source_node_id, target_node_id, condition_type, condition_value)
             VALUES (%s, %s, %s, %s, %s, %s)
         """, (edge_id, workflow_id, source_node_id, target_node_id, condition_type, condition_value))
         
-        self.conn.commit()
+        self._commit()
         return edge_id
\ No newline at end of file
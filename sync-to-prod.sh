@@ -41,7 +41,7 @@ export PG_DATABASE_URL="${PG_URL}"
 echo "PG_DATABASE_URL set for this process."
 
 echo "Running sync-all to prod..."
-python -m src.cli sync-all "$@"
+python -m src sync-all "$@"
 
 echo "Done."
 